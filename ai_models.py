@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.db import models
+
+from chat.models import Chat, Message
+
+# Side tables used by chat.ai_logic. They live in the chat app, so import them
+# from chat/models.py (`from chat.ai_models import *`) and run makemigrations. The
+# Message (chat, timestamp) index ships as migrations/0100_message_chat_timestamp_index.
+
+
+class ChatSummaryState(models.Model):
+    # Watermark for incremental topic summaries: every message with
+    # id <= last_message_id is already folded into chat.topic_summary.
+    chat = models.OneToOneField(Chat, on_delete=models.CASCADE, related_name="summary_state")
+    last_message_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = "chat"
+
+
+class MessageTokenCount(models.Model):
+    # Cached token count of message.content, filled by chat.context_builder
+    message = models.OneToOneField(Message, on_delete=models.CASCADE, related_name="token_count")
+    tokens = models.PositiveIntegerField()
+
+    class Meta:
+        app_label = "chat"
+
+
+class ProfileDigest(models.Model):
+    # Short summary of an About profile, keyed by chat.profile_digest.profile_key()
+    key = models.CharField(max_length=64, unique=True)
+    digest = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = "chat"
+
+
+class GenerationStats(models.Model):
+    # Ollama's token/timing metadata for one generation (durations in nanoseconds)
+    KIND_REPLY = "reply"
+    KIND_SUMMARY = "summary"
+    KIND_PROFILE_DIGEST = "profile_digest"
+    KIND_BRIEFING = "briefing"
+    KIND_ENTITIES = "entities"
+
+    chat = models.ForeignKey(Chat, null=True, on_delete=models.CASCADE, related_name="generation_stats")
+    message = models.OneToOneField(Message, null=True, on_delete=models.SET_NULL, related_name="generation_stats")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, on_delete=models.SET_NULL, related_name="+")
+    kind = models.CharField(max_length=20, default=KIND_REPLY)
+    model = models.CharField(max_length=100)
+    prompt_eval_count = models.PositiveIntegerField(default=0)
+    eval_count = models.PositiveIntegerField(default=0)
+    load_duration = models.BigIntegerField(default=0)
+    prompt_eval_duration = models.BigIntegerField(default=0)
+    eval_duration = models.BigIntegerField(default=0)
+    total_duration = models.BigIntegerField(default=0)
+    # "stop", "length" (hit num_predict), or "deadline"/"cancelled" for a reply cut off
+    # early; cut-off rows only count the tokens that arrived
+    done_reason = models.CharField(max_length=20, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        app_label = "chat"
+
+
+class ProfileEntities(models.Model):
+    # Teams/players an About profile follows, extracted once per profile_key()
+    key = models.CharField(max_length=64, unique=True)
+    entities = models.JSONField(default=list)  # [{"kind": "team"|"player", "name": ...}, ...]
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = "chat"
+
+
+class EntityBriefing(models.Model):
+    # One briefing per followed team/player (per sport, model and prompt version), shared
+    # by every coach who follows it; refreshed in batch by chat.briefings
+    key = models.CharField(max_length=64, unique=True)
+    kind = models.CharField(max_length=10)
+    name = models.CharField(max_length=200)
+    sport = models.CharField(max_length=100, blank=True)
+    briefing = models.TextField()
+    generated_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        app_label = "chat"
+
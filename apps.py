@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class ChatConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "chat"
+
+    def ready(self):
+        from chat import profile_digest  # noqa: F401 - registers the About post_save hook
+        from chat.llm_client import warm_up_in_background
+
+        # Load the chat model while the server starts instead of on the first request
+        if getattr(settings, "OLLAMA_WARM_UP_ON_START", True):
+            from chat.ai_logic import llm
+            warm_up_in_background([llm.model])
@@ -1,18 +1,60 @@
+import itertools
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
-from django.contrib.auth import get_user_model
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import BasePermission, IsAuthenticated
 from rest_framework.decorators import api_view, permission_classes
 
 from chat.models import Chat, Message
-from chat.ai_logic import generate_response_from_chat
+from chat.ai_logic import (
+    llm, router, response_cache, generate_response_from_chat, stream_response_from_chat,
+    agenerate_response_from_chat, astream_response_from_chat, reply_deadline,
+)
+from chat.llm_client import health
+from chat.scheduler import Overloaded
+from chat.metrics import Timings, render_prometheus
+
+
+class IsStaffOrInternal(BasePermission):
+    # Health and metrics list the loaded models and their latencies: staff users only,
+    # plus unauthenticated probes/scrapers from settings.INTERNAL_IPS
+    def has_permission(self, request, view):
+        if request.user and request.user.is_staff:
+            return True
+        return request.META.get("REMOTE_ADDR") in getattr(settings, "INTERNAL_IPS", ())
+
+
+def request_deadline(request):
+    # Clients that give up after N seconds send X-Request-Timeout: N, so the model is not
+    # kept busy past that; CHAT_REPLY_DEADLINE_SECONDS still caps it. The header can only
+    # shorten the deadline: nan, inf, zero, negative or garbage values are ignored.
+    try:
+        timeout = float(request.headers.get("X-Request-Timeout", ""))
+    except ValueError:
+        timeout = None
+    if timeout is not None and not (math.isfinite(timeout) and timeout > 0):
+        timeout = None
+    return reply_deadline(timeout)
+
 
-User = get_user_model()
+def overloaded_response(e):
+    response = Response({"error": str(e), "retry_after": e.retry_after}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    response["Retry-After"] = str(e.retry_after)
+    return response
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def chat_with_assistant(request, chat_id):
+    deadline = request_deadline(request)
     user = request.user
     user_input = request.data.get("message")
     if not user_input:
@@ -22,18 +64,189 @@ def chat_with_assistant(request, chat_id):
     chat = get_object_or_404(Chat, id=chat_id, participants=user)
 
     try:
-        # Call your AI logic function (returns reply and updated chat text)
-        reply, chat_log = generate_response_from_chat(chat, user, user_input)
+        # Call your AI logic function (returns reply and updated chat text).
+        # It also adds the chatbot user as a participant and saves both messages.
+        timings = Timings()
+        reply, chat_log = generate_response_from_chat(chat, user, user_input, timings, deadline)
+
+        # Return AI reply and chat log (+ per-stage timings in ms when DEBUG is on)
+        data = {
+            "reply": reply,
+            "chat_log": chat_log,
+        }
+        if settings.DEBUG:
+            data["timings"] = timings.as_dict()
+        return Response(data, status=status.HTTP_200_OK)
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        return Response({"error": f"AI logic error: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def chat_with_assistant_stream(request, chat_id):
+    # Server-Sent Events version of chat_with_assistant: tokens are forwarded as
+    # they come out of the model, then a final "done" event carries the message ids.
+    deadline = request_deadline(request)
+    user = request.user
+    user_input = request.data.get("message")
+    if not user_input:
+        return Response({"error": "No message provided."}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Get the chat ensuring user is a participant
+    chat = get_object_or_404(Chat, id=chat_id, participants=user)
+
+    # Pull the first event here so admission control can still answer with a 429
+    timings = Timings()
+    events = stream_response_from_chat(chat, user, user_input, timings, deadline)
+    try:
+        first_event = next(events, None)
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        return Response({"error": f"AI logic error: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def event_stream():
+        try:
+            for event in itertools.chain([first_event] if first_event else [], events):
+                name = event.pop("event")
+                if name == "done" and settings.DEBUG:
+                    event["timings"] = timings.as_dict()
+                yield f"event: {name}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            error = json.dumps({"error": f"AI logic error: {str(e)}"})
+            yield f"event: error\ndata: {error}\n\n"
+        finally:
+            # The server closes event_stream() when the client disconnects; passing that
+            # on stops the generation instead of letting it run to the end
+            events.close()
+
+    response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # stop nginx from buffering the stream
+    return response
 
-        # Ensure chatbot user is participant and save messages (already done in ai_logic)
-        bot_user, _ = User.objects.get_or_create(username="chatbot")
-        if bot_user not in chat.participants.all():
-            chat.participants.add(bot_user)
 
-        # Return AI reply and chat log
-        return Response({
+# --- async views ---
+# DRF's @api_view is sync-only, so these are plain Django async views. They reuse DRF's
+# configured authenticators and parsers, then await the model without holding a thread.
+# Route them like the sync ones (e.g. chat/<id>/async/) and serve with an ASGI server.
+
+def _authenticate(request):
+    drf_request = APIView().initialize_request(request)
+    return drf_request.user, drf_request.data
+
+
+def _json_error(message, code, retry_after=None):
+    data = {"error": message}
+    if retry_after is not None:
+        data["retry_after"] = retry_after
+    response = JsonResponse(data, status=code)
+    if retry_after is not None:
+        response["Retry-After"] = str(retry_after)
+    return response
+
+
+async def _chat_request(request, chat_id):
+    # Returns (chat, user, user_input) or an error response
+    try:
+        user, data = await sync_to_async(_authenticate)(request)
+    except Exception as e:
+        return _json_error(str(e), status.HTTP_401_UNAUTHORIZED)
+    if not user.is_authenticated:
+        return _json_error("Authentication credentials were not provided.", status.HTTP_401_UNAUTHORIZED)
+    user_input = data.get("message")
+    if not user_input:
+        return _json_error("No message provided.", status.HTTP_400_BAD_REQUEST)
+
+    # Get the chat ensuring user is a participant
+    try:
+        chat = await Chat.objects.aget(id=chat_id, participants=user)
+    except Chat.DoesNotExist:
+        raise Http404("No Chat matches the given query.")
+    return chat, user, user_input
+
+
+@csrf_exempt
+@require_POST
+async def chat_with_assistant_async(request, chat_id):
+    deadline = request_deadline(request)
+    result = await _chat_request(request, chat_id)
+    if isinstance(result, HttpResponse):
+        return result
+    chat, user, user_input = result
+
+    try:
+        timings = Timings()
+        reply, chat_log = await agenerate_response_from_chat(chat, user, user_input, timings, deadline)
+        data = {
             "reply": reply,
             "chat_log": chat_log,
-        }, status=status.HTTP_200_OK)
+        }
+        if settings.DEBUG:
+            data["timings"] = timings.as_dict()
+        return JsonResponse(data, status=status.HTTP_200_OK)
+    except Overloaded as e:
+        return _json_error(str(e), status.HTTP_429_TOO_MANY_REQUESTS, e.retry_after)
+    except Exception as e:
+        return _json_error(f"AI logic error: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@csrf_exempt
+@require_POST
+async def chat_with_assistant_stream_async(request, chat_id):
+    deadline = request_deadline(request)
+    result = await _chat_request(request, chat_id)
+    if isinstance(result, HttpResponse):
+        return result
+    chat, user, user_input = result
+
+    # Pull the first event here so admission control can still answer with a 429
+    timings = Timings()
+    events = astream_response_from_chat(chat, user, user_input, timings, deadline)
+    try:
+        first_event = await anext(events, None)
+    except Overloaded as e:
+        return _json_error(str(e), status.HTTP_429_TOO_MANY_REQUESTS, e.retry_after)
     except Exception as e:
-        return Response({"error": f"AI logic error: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        return _json_error(f"AI logic error: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    async def event_stream():
+        try:
+            event = first_event
+            while event is not None:
+                name = event.pop("event")
+                if name == "done" and settings.DEBUG:
+                    event["timings"] = timings.as_dict()
+                yield f"event: {name}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+                event = await anext(events, None)
+        except Exception as e:
+            error = json.dumps({"error": f"AI logic error: {str(e)}"})
+            yield f"event: error\ndata: {error}\n\n"
+        finally:
+            # On a client disconnect Django cancels or closes event_stream(); see the sync view
+            await events.aclose()
+
+    response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # stop nginx from buffering the stream
+    return response
+
+
+@api_view(["GET"])
+@permission_classes([IsStaffOrInternal])
+def llm_health(request):
+    # 200 when Ollama is reachable and the chat model is loaded, 503 otherwise
+    result = health(llm.model)
+    code = status.HTTP_200_OK if result["resident"] else status.HTTP_503_SERVICE_UNAVAILABLE
+    return Response(result, status=code)
+
+
+@api_view(["GET"])
+@permission_classes([IsStaffOrInternal])
+def chat_metrics(request):
+    # Prometheus scrape endpoint for the chat_stage_seconds histograms, generation
+    # outcome counters, model routing and response cache counters (per process)
+    body = render_prometheus() + router.render_prometheus() + response_cache.render_prometheus()
+    return HttpResponse(body, content_type="text/plain; version=0.0.4")
@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_ollama import FakeOllama
+
+# What abandoned requests cost the model server, against the fake Ollama:
+#   invoke     - llm.invoke(), the old path: runs to the end whatever the client does
+#   deadline   - GenerationStream.run() with a deadline of --timeout seconds
+#   adeadline  - the same with GenerationStream.arun() on one event loop
+#   disconnect - GenerationStream.stream() closed after --read-tokens tokens, like a
+#                streaming client that went away
+#   ceiling    - no deadline, but num_predict=--num-predict caps the reply
+# "server tokens" is what the fake generated; once a stream is closed it stops, the
+# way Ollama does when its client disconnects. No Django needed.
+
+SCENARIOS = ("invoke", "deadline", "adeadline", "disconnect", "ceiling")
+
+
+def run_scenario(name, args):
+    from langchain_core.messages import HumanMessage
+    from llm_client import GenerationStream, get_llm
+
+    llm = get_llm("fake", num_predict=args.num_predict) if name == "ceiling" else get_llm("fake")
+
+    def prompt(i):
+        return [HumanMessage(f"client {i}: how did my team play last night?")]
+
+    def one(i):
+        started = time.monotonic()
+        if name == "invoke":
+            message = llm.invoke(prompt(i))
+            return message.response_metadata.get("done_reason"), len(message.content.split()), time.monotonic() - started
+        if name == "disconnect":
+            generation = GenerationStream(llm, prompt(i))
+            chunks = generation.stream()
+            for n, _ in enumerate(chunks, 1):
+                if n >= args.read_tokens:
+                    chunks.close()
+                    break
+        elif name == "ceiling":
+            generation = GenerationStream(llm, prompt(i)).run()
+        else:
+            generation = GenerationStream(llm, prompt(i), started + args.timeout).run()
+        return generation.done_reason, len(generation.chunks), generation.elapsed
+
+    if name == "adeadline":
+        async def main():
+            async def call(i):
+                generation = GenerationStream(llm, prompt(i), time.monotonic() + args.timeout)
+                await generation.arun()
+                return generation.done_reason, len(generation.chunks), generation.elapsed
+            return await asyncio.gather(*(call(i) for i in range(args.clients)))
+        return asyncio.run(main())
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        return list(pool.map(one, range(args.clients)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure what deadlines and cancellation save on the model server.")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--clients", type=int, default=8, help="concurrent requests per scenario")
+    parser.add_argument("--timeout", type=float, default=2.0, help="client deadline in seconds")
+    parser.add_argument("--read-tokens", type=int, default=20, help="tokens a disconnecting client reads")
+    parser.add_argument("--num-predict", type=int, default=60, help="token ceiling for the ceiling scenario")
+    parser.add_argument("--tokens-per-second", type=float, default=30.0, help="fake server generation speed")
+    parser.add_argument("--reply-tokens", type=int, default=200, help="fake server reply length")
+    args = parser.parse_args()
+
+    server = FakeOllama(tokens_per_second=args.tokens_per_second, reply_tokens=args.reply_tokens).start()
+    # Read at import time; leave the ceiling to the ceiling scenario
+    os.environ["OLLAMA_BASE_URL"] = server.base_url
+    os.environ["OLLAMA_NUM_PREDICT"] = "0"
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    print(f"{args.clients} client(s), {args.reply_tokens}-token replies at {args.tokens_per_second:g} tok/s, "
+          f"{args.timeout:g}s client timeout")
+    print(f"{'scenario':>10} {'done_reason':>14} {'tokens recv':>11} {'server tokens':>13} "
+          f"{'server cancelled':>16} {'mean s':>7}")
+    for name in args.scenarios:
+        before = dict(server.stats)
+        results = run_scenario(name, args)
+        time.sleep(0.3)  # let the fake notice closed connections
+        reasons = sorted({reason or "-" for reason, _, _ in results})
+        print(f"{name:>10} {','.join(reasons):>14} {sum(r[1] for r in results):>11} "
+              f"{server.stats['eval_tokens'] - before['eval_tokens']:>13} "
+              f"{server.stats['cancelled'] - before['cancelled']:>16} "
+              f"{sum(r[2] for r in results) / len(results):>7.2f}")
@@ -0,0 +1,200 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from fake_ollama import FakeOllama
+from replay import DEFAULT_LOGS, RESULTS_DIR, _git_commit, _server_reachable, load_sessions, percentile, user_turns
+
+# Many conversations at once against the chat logic, sync vs async:
+#   sync  - generate_response_from_chat on a pool of --threads workers, like a gthread
+#           gunicorn worker; a turn waiting on the model pins one of those threads
+#   async - agenerate_response_from_chat for every conversation on one event loop
+# Each conversation sends its turns back to back; a turn's latency runs from when it
+# could have been sent (previous reply, or the start) to its reply, so queueing counts.
+# Needs DJANGO_SETTINGS_MODULE; throwaway users/chats are created and deleted.
+
+
+def make_conversations(count, turns, log_dirs):
+    from django.contrib.auth import get_user_model
+    from about.models import About
+    from chat.models import Chat
+
+    sessions = load_sessions(log_dirs)
+    questions = [q for s in sessions for q in user_turns(s)] or ["How is my favorite team doing?"]
+    conversations = []
+    for i in range(count):
+        session = sessions[i % len(sessions)] if sessions else {}
+        user = get_user_model().objects.create(username=f"bench_{uuid.uuid4().hex[:12]}")
+        # Distinct details per user so the response cache does not answer for everyone
+        About.objects.create(user=user, sport_coach=session.get("sport", ""),
+                             details=f"{session.get('details', '')}\n(bench coach {i})")
+        chat = Chat.objects.create()
+        chat.participants.add(user)
+        conversations.append((chat, user, [questions[(i + t) % len(questions)] for t in range(turns)]))
+    return conversations
+
+
+def run_sync(conversations, threads):
+    from django.db import close_old_connections
+    from chat.ai_logic import generate_response_from_chat
+
+    started = time.perf_counter()
+
+    def conversation(args):
+        chat, user, questions = args
+        rows = []
+        sent = started
+        try:
+            for question in questions:
+                generate_response_from_chat(chat, user, question)
+                done = time.perf_counter()
+                rows.append({"latency": done - sent, "error": None})
+                sent = done
+        except Exception as e:
+            rows.append({"latency": None, "error": f"{type(e).__name__}: {e}"})
+        finally:
+            close_old_connections()
+        return rows
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = [row for rows in pool.map(conversation, conversations) for row in rows]
+    return results, time.perf_counter() - started
+
+
+def run_async(conversations):
+    from chat.ai_logic import agenerate_response_from_chat
+
+    async def conversation(chat, user, questions, started):
+        rows = []
+        sent = started
+        try:
+            for question in questions:
+                await agenerate_response_from_chat(chat, user, question)
+                done = time.perf_counter()
+                rows.append({"latency": done - sent, "error": None})
+                sent = done
+        except Exception as e:
+            rows.append({"latency": None, "error": f"{type(e).__name__}: {e}"})
+        return rows
+
+    async def main():
+        started = time.perf_counter()
+        batches = await asyncio.gather(*(conversation(*c, started) for c in conversations))
+        return [row for rows in batches for row in rows], time.perf_counter() - started
+
+    return asyncio.run(main())
+
+
+def watch_threads(stop, peak):
+    while not stop.is_set():
+        peak[0] = max(peak[0], threading.active_count())
+        time.sleep(0.05)
+
+
+def measure(mode, conversations, threads):
+    stop = threading.Event()
+    peak = [threading.active_count()]
+    watcher = threading.Thread(target=watch_threads, args=(stop, peak), daemon=True)
+    watcher.start()
+    if mode == "sync":
+        results, wall_seconds = run_sync(conversations, threads)
+    else:
+        results, wall_seconds = run_async(conversations)
+    stop.set()
+    watcher.join()
+
+    latencies = [r["latency"] for r in results if r["latency"] is not None]
+    errors = [r["error"] for r in results if r["error"]]
+    return {
+        "mode": mode,
+        "turns": len(latencies),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "wall_seconds": wall_seconds,
+        "turns_per_second": len(latencies) / wall_seconds if wall_seconds else None,
+        "latency_seconds": {
+            "p50": percentile(latencies, 50), "p95": percentile(latencies, 95), "p99": percentile(latencies, 99),
+            "mean": statistics.fmean(latencies) if latencies else None,
+        },
+        "peak_threads": peak[0],
+    }
+
+
+def _print_summary(summary):
+    lat = summary["latency_seconds"]
+    fmt = lambda v: f"{v:.3f}" if v is not None else "n/a"  # noqa: E731
+    print(f"{summary['mode']:6} turns={summary['turns']} errors={summary['errors']} "
+          f"wall={summary['wall_seconds']:.1f}s {summary['turns_per_second']:.2f} turns/s  "
+          f"p50={fmt(lat['p50'])} p95={fmt(lat['p95'])} p99={fmt(lat['p99'])}  "
+          f"peak_threads={summary['peak_threads']}")
+    for error in summary["error_samples"]:
+        print(f"  error: {error}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare sync and async chat paths under many concurrent conversations.")
+    parser.add_argument("--mode", choices=["sync", "async", "both"], default="both")
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=2, help="turns per conversation")
+    parser.add_argument("--threads", type=int, default=8, help="sync worker threads (gunicorn --threads)")
+    parser.add_argument("--server", choices=["auto", "fake", "real"], default="auto",
+                        help="auto uses a real Ollama at --base-url when one answers, else the fake")
+    parser.add_argument("--base-url", default=os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434"))
+    parser.add_argument("--logs", nargs="+", default=DEFAULT_LOGS, help="chat_logs directories for questions")
+    parser.add_argument("--tokens-per-second", type=float, default=30.0, help="fake server generation speed")
+    parser.add_argument("--prompt-tps", type=float, default=400.0, help="fake server prompt-eval speed")
+    parser.add_argument("--reply-tokens", type=int, default=40, help="fake server reply length")
+    parser.add_argument("--output", help="results file (default bench/results/<time>-<commit>-concurrency.json)")
+    args = parser.parse_args()
+
+    server = None
+    if args.server == "fake" or (args.server == "auto" and not _server_reachable(args.base_url)):
+        server = FakeOllama(tokens_per_second=args.tokens_per_second, prompt_tps=args.prompt_tps,
+                            reply_tokens=args.reply_tokens).start()
+        args.base_url = server.base_url
+    # Read at import time. The fake generates in parallel, so let the scheduler admit
+    # every conversation; against a real server set LLM_MAX_CONCURRENCY etc. yourself.
+    os.environ["OLLAMA_BASE_URL"] = args.base_url
+    if server:
+        os.environ.setdefault("LLM_MAX_CONCURRENCY", str(args.conversations))
+        os.environ.setdefault("LLM_MAX_QUEUE", str(args.conversations))
+    os.environ.setdefault("LLM_USER_BURST", str(args.turns))
+
+    import django
+    django.setup()
+
+    print(f"{args.conversations} conversation(s) x {args.turns} turn(s) against "
+          f"{'fake' if server else 'real'} Ollama at {args.base_url}")
+    modes = ["sync", "async"] if args.mode == "both" else [args.mode]
+    summaries = []
+    for mode in modes:
+        conversations = make_conversations(args.conversations, args.turns, args.logs)
+        try:
+            summary = measure(mode, conversations, args.threads)
+        finally:
+            for _, user, _ in conversations:
+                user.delete()
+        _print_summary(summary)
+        summaries.append(summary)
+
+    commit = _git_commit()
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}-{commit or 'nogit'}-concurrency.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "commit": commit,
+            "timestamp": datetime.now().isoformat(),
+            "config": {k: v for k, v in vars(args).items() if k != "output"},
+            "server": "fake" if server else "real",
+            "summaries": summaries,
+        }, f, indent=2)
+    print(f"Results saved to {output}")
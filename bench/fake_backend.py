@@ -0,0 +1,121 @@
+import argparse
+import hashlib
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeBackend(ThreadingHTTPServer):
+    # Local stand-in for the auth backend demo_chatbot.py talks to:
+    #   GET  /api/about/         - About JSON with an ETag, 304 on If-None-Match
+    #   POST /api/chat-detail/   - 201 {"id": ...}
+    #   POST /api/chat-history/  - 201; fail_rate of them answer 503 instead
+    #   GET  /bench/stats        - request counters and the saved messages
+    # Point the demo at it with BACKEND_API_BASE=<base_url>.
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), about=None, latency=0.0, fail_rate=0.0):
+        super().__init__(address, _Handler)
+        self.about = about or {"sport_coach": "Basketball", "details": "I coach a high school team."}
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.messages = []
+        self.stats = {"about": 0, "about_not_modified": 0, "chats": 0, "saves": 0, "save_failures": 0}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def etag(self):
+        body = json.dumps(self.about, sort_keys=True).encode("utf-8")
+        return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.latency)
+        if self.path == "/api/about/":
+            etag = server.etag()
+            with server.lock:
+                server.stats["about"] += 1
+                if self.headers.get("If-None-Match") == etag:
+                    server.stats["about_not_modified"] += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+            self._json(server.about, headers={"ETag": etag})
+        elif self.path == "/bench/stats":
+            with server.lock:
+                self._json({**server.stats, "messages": server.messages})
+        else:
+            self._json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        server = self.server
+        request = self._body()
+        time.sleep(server.latency)
+        if self.path == "/api/chat-detail/":
+            with server.lock:
+                server.stats["chats"] += 1
+                chat_id = next(server.ids)
+            self._json({"id": chat_id, **request}, 201)
+        elif self.path == "/api/chat-history/":
+            with server.lock:
+                if random.random() < server.fail_rate:
+                    server.stats["save_failures"] += 1
+                    failed = True
+                else:
+                    server.stats["saves"] += 1
+                    server.messages.append(request)
+                    failed = False
+            if failed:
+                self._json({"error": "temporarily unavailable"}, 503)
+            else:
+                self._json(request, 201)
+        else:
+            self._json({"error": "not found"}, 404)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake auth/chat backend for demo_chatbot.py.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="fixed delay per request")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of message saves answered with 503")
+    args = parser.parse_args()
+
+    server = FakeBackend(("127.0.0.1", args.port), latency=args.latency, fail_rate=args.fail_rate)
+    print(f"Fake backend listening on {server.base_url}")
+    server.serve_forever()
@@ -0,0 +1,209 @@
+import argparse
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Rough chars-per-token ratio for the fake's token accounting
+CHARS_PER_TOKEN = 4
+EMBEDDING_DIM = 64
+WORDS = ("the", "coach", "team", "player", "season", "defense", "shooting", "drill", "focus", "game")
+
+
+class FakeOllama(ThreadingHTTPServer):
+    # Speaks enough of the Ollama HTTP API (/api/chat, /api/generate, /api/embed, /api/ps)
+    # for ChatOllama/OllamaEmbeddings. Timing is simulated:
+    #   load_seconds      - extra delay on the first call for a model (cold start)
+    #   prompt_tps        - prompt-eval speed; only tokens after the prefix shared with the
+    #                       previous prompt for that model are evaluated, like llama.cpp's cache
+    #   tokens_per_second - generation speed for reply_tokens tokens
+    #   stall_after       - with stall_seconds: pause that long after this many tokens,
+    #                       like a server that stops mid-reply
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), tokens_per_second=30.0, prompt_tps=400.0,
+                 reply_tokens=120, load_seconds=0.0, latency=0.0, stall_after=0, stall_seconds=0.0):
+        super().__init__(address, _Handler)
+        self.tokens_per_second = tokens_per_second
+        self.prompt_tps = prompt_tps
+        self.reply_tokens = reply_tokens
+        self.load_seconds = load_seconds
+        self.latency = latency
+        self.stall_after = stall_after
+        self.stall_seconds = stall_seconds
+        self.lock = threading.Lock()
+        self.loaded = set()
+        self.last_prompt = {}
+        self.stats = {"requests": 0, "completed": 0, "cancelled": 0, "prompt_tokens": 0, "eval_tokens": 0}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def prompt_cost(self, model, prompt):
+        # Returns (evaluated prompt tokens, load seconds) for this request
+        with self.lock:
+            previous = self.last_prompt.get(model, "")
+            self.last_prompt[model] = prompt
+            shared = 0
+            for a, b in zip(previous, prompt):
+                if a != b:
+                    break
+                shared += 1
+            load = 0.0 if model in self.loaded else self.load_seconds
+            self.loaded.add(model)
+            self.stats["requests"] += 1
+        return max(1, (len(prompt) - shared) // CHARS_PER_TOKEN), load
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/api/ps":
+            models = sorted(self.server.loaded)
+            self._json({"models": [{"name": m, "model": m} for m in models]})
+        elif self.path == "/bench/stats":
+            self._json(self.server.stats)
+        else:
+            self._json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        request = self._body()
+        if self.path == "/api/chat":
+            prompt = "".join(f"{m.get('role')}:{m.get('content')}\n" for m in request.get("messages", []))
+            self._generate(request, prompt, chat=True)
+        elif self.path == "/api/generate":
+            self._generate(request, request.get("prompt", ""), chat=False)
+        elif self.path == "/api/embed":
+            inputs = request.get("input", [])
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            self._json({"model": request.get("model"), "embeddings": [_embed(text) for text in inputs]})
+        else:
+            self._json({"error": "not found"}, 404)
+
+    def _generate(self, request, prompt, chat):
+        server = self.server
+        model = request.get("model", "fake")
+        options = request.get("options") or {}
+        stream = request.get("stream", True)
+        prompt_tokens, load = server.prompt_cost(model, prompt)
+        reply_tokens = min(server.reply_tokens, options.get("num_predict") or server.reply_tokens)
+        capped = reply_tokens < server.reply_tokens  # num_predict cut the reply short
+        if not prompt.strip() and not chat:
+            reply_tokens = 0  # warm-up call
+
+        started = time.perf_counter()
+        prompt_seconds = prompt_tokens / server.prompt_tps
+        time.sleep(server.latency + load + prompt_seconds)
+
+        def chunk(text, done, eval_count=0):
+            payload = {"model": model, "created_at": datetime.now(timezone.utc).isoformat(), "done": done}
+            if chat:
+                payload["message"] = {"role": "assistant", "content": text}
+            else:
+                payload["response"] = text
+            if done:
+                total = time.perf_counter() - started
+                payload.update({
+                    "done_reason": "length" if capped else "stop",
+                    "total_duration": int(total * 1e9),
+                    "load_duration": int(load * 1e9),
+                    "prompt_eval_count": prompt_tokens,
+                    "prompt_eval_duration": int(prompt_seconds * 1e9),
+                    "eval_count": eval_count,
+                    "eval_duration": int(max(0.0, total - load - prompt_seconds - server.latency) * 1e9),
+                })
+            return payload
+
+        tokens = [WORDS[i % len(WORDS)] + " " for i in range(reply_tokens)]
+        if not stream:
+            time.sleep(reply_tokens / server.tokens_per_second)
+            self._record(prompt_tokens, reply_tokens, cancelled=False)
+            self._json(chunk("".join(tokens).strip(), True, reply_tokens))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        sent = 0
+        try:
+            for token in tokens:
+                if server.stall_seconds and sent == server.stall_after:
+                    time.sleep(server.stall_seconds)
+                time.sleep(1 / server.tokens_per_second)
+                self._write_chunk(chunk(token, False))
+                sent += 1
+            self._write_chunk(chunk("", True, sent))
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away: stop generating, like Ollama does on a closed connection
+            self._record(prompt_tokens, sent, cancelled=True)
+            self.close_connection = True
+            return
+        self._record(prompt_tokens, sent, cancelled=False)
+
+    def _write_chunk(self, payload):
+        data = (json.dumps(payload) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _record(self, prompt_tokens, eval_tokens, cancelled):
+        with self.server.lock:
+            stats = self.server.stats
+            stats["cancelled" if cancelled else "completed"] += 1
+            stats["prompt_tokens"] += prompt_tokens
+            stats["eval_tokens"] += eval_tokens
+
+
+def _embed(text):
+    # Deterministic bag-of-words vector, so similar questions land close together
+    vector = [0.0] * EMBEDDING_DIM
+    for word in text.lower().split():
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        vector[digest[0] % EMBEDDING_DIM] += 1.0
+    return vector
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server for benchmarks.")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--tokens-per-second", type=float, default=30.0)
+    parser.add_argument("--prompt-tps", type=float, default=400.0)
+    parser.add_argument("--reply-tokens", type=int, default=120)
+    parser.add_argument("--load-seconds", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.0, help="fixed delay before prompt eval")
+    parser.add_argument("--stall-after", type=int, default=0, help="tokens sent before the stall")
+    parser.add_argument("--stall-seconds", type=float, default=0.0, help="pause in the middle of a reply")
+    args = parser.parse_args()
+
+    server = FakeOllama(("127.0.0.1", args.port), args.tokens_per_second, args.prompt_tps,
+                        args.reply_tokens, args.load_seconds, args.latency, args.stall_after, args.stall_seconds)
+    print(f"Fake Ollama listening on {server.base_url}")
+    server.serve_forever()
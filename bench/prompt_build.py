@@ -0,0 +1,71 @@
+import argparse
+import statistics
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+from replay import DEFAULT_LOGS, SYSTEM_MESSAGE, load_sessions
+
+# Prompt-build time per turn as history grows:
+#   rebuilt  - ChatPromptTemplate.from_messages over the whole history every turn (old way;
+#              every message is parsed as a format string)
+#   compiled - one template compiled up front, history passed to MessagesPlaceholder as
+#              message objects (what chat.ai_logic and the terminal bots do now)
+# No model is called; this only times building the prompt.
+
+compiled_prompt = ChatPromptTemplate.from_messages([
+    ("system", "{system_message}"),
+    MessagesPlaceholder("history"),
+    ("human", "{user_input}"),
+])
+
+
+def sample_texts(log_dirs):
+    texts = [t["content"] for s in load_sessions(log_dirs) for t in s["chat_details"] if t.get("content")]
+    # The rebuilt path would treat braces as template variables and fail
+    texts = [t.replace("{", "(").replace("}", ")") for t in texts]
+    return texts or ["How did my team do last night?", "They won by twelve, led by a strong second half."]
+
+
+def make_history(texts, size):
+    return [(("user", "assistant")[i % 2], texts[i % len(texts)]) for i in range(size)]
+
+
+def build_rebuilt(system_message, history, user_input):
+    prompt = ChatPromptTemplate.from_messages([("system", system_message)] + history + [("user", user_input)])
+    return prompt.invoke({})
+
+
+def build_compiled(system_message, history, user_input):
+    return compiled_prompt.invoke({"system_message": system_message, "history": history, "user_input": user_input})
+
+
+def time_per_turn(fn, args, repeats):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time prompt building per turn for growing chat histories.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100, 200, 400, 800],
+                        help="history lengths in messages")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--logs", nargs="+", default=DEFAULT_LOGS, help="chat_logs directories for message text")
+    args = parser.parse_args()
+
+    texts = sample_texts(args.logs)
+    system_message = SYSTEM_MESSAGE.format(sport="Basketball", details="I coach a high school team.")
+    user_input = "What should we work on before Friday's game?"
+
+    print(f"{'messages':>8} {'rebuilt ms':>11} {'compiled ms':>12} {'speedup':>8}")
+    for size in args.sizes:
+        tuples = make_history(texts, size)
+        objects = [HumanMessage(c) if role == "user" else AIMessage(c) for role, c in tuples]
+        rebuilt = time_per_turn(build_rebuilt, (system_message, tuples, user_input), args.repeats)
+        compiled = time_per_turn(build_compiled, (system_message, objects, user_input), args.repeats)
+        print(f"{size:>8} {rebuilt:>11.3f} {compiled:>12.3f} {rebuilt / compiled:>7.1f}x")
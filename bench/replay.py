@@ -0,0 +1,271 @@
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [REPO_ROOT, os.path.join(REPO_ROOT, "lama")]
+
+from fake_ollama import FakeOllama  # noqa: E402
+from log_store import iter_sessions, load_session_file  # noqa: E402
+
+RESULTS_DIR = os.path.join(REPO_ROOT, "bench", "results")
+DEFAULT_LOGS = [os.path.join(REPO_ROOT, "chat_logs"), os.path.join(REPO_ROOT, "lama", "chat_logs")]
+
+# Same shape as the terminal bots' system prompt, so prompt sizes are comparable
+SYSTEM_MESSAGE = """
+You are a detailed and intelligent sports assistant — like a personal sports analyst — designed to support coaches with insightful updates and tailored guidance.
+
+The user is a sports coach who specializes in: **{sport}**.
+Here’s what the user said about themselves:
+---
+{details}
+---
+
+Avoid sounding like a news presenter. Be casual, insightful, and sport-specific.
+"""
+
+
+def load_sessions(log_dirs):
+    # Old per-session JSON files plus sessions from the append-only log store
+    sessions = []
+    for directory in log_dirs:
+        for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+            sessions.append(load_session_file(path))
+        sessions.extend(iter_sessions(os.path.join(directory, "store")))
+    return [s for s in sessions if any(t.get("role") == "user" for t in s.get("chat_details", []))]
+
+
+def user_turns(session):
+    return [t["content"] for t in session["chat_details"] if t.get("role") == "user"]
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+# --- targets ---
+
+def replay_cli(session, model, results):
+    # The terminal bots' loop: PrefixStableHistory + a streamed reply per user turn
+    from llm_client import get_llm
+    from prompt_layout import PrefixStableHistory
+
+    llm = get_llm(model, temperature=0.7, top_k=40, top_p=0.9, repeat_penalty=1.1, num_ctx=4096)
+    system_message = SYSTEM_MESSAGE.format(sport=session.get("sport", ""), details=session.get("details", ""))
+    history = PrefixStableHistory(system_message, llm)
+
+    for user_input in user_turns(session):
+        history.append("user", user_input)
+        if history.needs_checkpoint():
+            history.checkpoint()
+        started = time.perf_counter()
+        ttft = None
+        chunks = []
+        meta = {}
+        for chunk in llm.stream(history.prompt_messages()):
+            if chunk.content and ttft is None:
+                ttft = time.perf_counter() - started
+            chunks.append(chunk.content)
+            meta = chunk.response_metadata or meta
+        e2e = time.perf_counter() - started
+        reply = "".join(chunks).strip()
+        history.append("assistant", reply)
+        results.append({
+            "user": session.get("username"), "e2e": e2e, "ttft": ttft,
+            "prompt_tokens": meta.get("prompt_eval_count"), "eval_tokens": meta.get("eval_count"),
+        })
+
+
+def replay_django(session, model, results):
+    # generate_response_from_chat's streaming twin, against a throwaway user/About/Chat
+    from django.contrib.auth import get_user_model
+    from about.models import About
+    from chat.models import Chat
+    from chat.ai_logic import stream_response_from_chat
+    from chat.ai_models import GenerationStats
+
+    user = get_user_model().objects.create(username=f"bench_{uuid.uuid4().hex[:12]}")
+    try:
+        About.objects.create(user=user, sport_coach=session.get("sport", ""), details=session.get("details", ""))
+        chat = Chat.objects.create()
+        chat.participants.add(user)
+        for user_input in user_turns(session):
+            started = time.perf_counter()
+            ttft = None
+            message_id = None
+            for event in stream_response_from_chat(chat, user, user_input):
+                if event["event"] == "token" and ttft is None:
+                    ttft = time.perf_counter() - started
+                elif event["event"] == "done":
+                    message_id = event["assistant_message_id"]
+                elif event["event"] == "error":
+                    raise RuntimeError(event["error"])
+            e2e = time.perf_counter() - started
+            # Token counts are the GenerationStats row saved with the reply. Cache and
+            # briefing answers made no model call and have none; they stay None, not 0.
+            stats = GenerationStats.objects.filter(message_id=message_id).first() if message_id else None
+            results.append({
+                "user": session.get("username"), "e2e": e2e, "ttft": ttft,
+                "prompt_tokens": stats.prompt_eval_count if stats else None,
+                "eval_tokens": stats.eval_count if stats else None,
+            })
+    finally:
+        user.delete()
+
+
+def run(target, sessions, users, model):
+    results = []
+    errors = []
+    lock = threading.Lock()
+
+    def virtual_user(index):
+        for session in sessions[index::users]:
+            rows = []
+            try:
+                target(session, model, rows)
+            except Exception as e:
+                with lock:
+                    errors.append(f"{session.get('username')}: {e}")
+            with lock:
+                results.extend(rows)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        list(pool.map(virtual_user, range(users)))
+    return results, errors, time.perf_counter() - started
+
+
+def summarize(results, errors, wall_seconds):
+    def dist(key):
+        values = [r[key] for r in results if r[key] is not None]
+        return {
+            "p50": percentile(values, 50), "p95": percentile(values, 95), "p99": percentile(values, 99),
+            "mean": statistics.fmean(values) if values else None,
+        }
+
+    eval_tokens = sum(r["eval_tokens"] or 0 for r in results)
+    return {
+        "turns": len(results),
+        # prompt_tokens_per_turn covers only these; the rest had no token counts
+        "turns_with_token_counts": sum(r["prompt_tokens"] is not None for r in results),
+        "errors": len(errors),
+        "wall_seconds": wall_seconds,
+        "e2e_seconds": dist("e2e"),
+        "ttft_seconds": dist("ttft"),
+        "prompt_tokens_per_turn": dist("prompt_tokens"),
+        "turns_per_second": len(results) / wall_seconds if wall_seconds else None,
+        "output_tokens_per_second": eval_tokens / wall_seconds if wall_seconds else None,
+    }
+
+
+def _server_reachable(base_url):
+    try:
+        urllib.request.urlopen(f"{base_url}/api/ps", timeout=1)
+        return True
+    except Exception:
+        return False
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def _print_summary(summary, previous=None):
+    for key in ("e2e_seconds", "ttft_seconds", "prompt_tokens_per_turn"):
+        line = "  ".join(
+            f"{p}={summary[key][p]:.3f}" if summary[key][p] is not None else f"{p}=n/a"
+            for p in ("p50", "p95", "p99")
+        )
+        if previous and previous[key]["p50"] and summary[key]["p50"] is not None:
+            change = (summary[key]["p50"] - previous[key]["p50"]) / previous[key]["p50"] * 100
+            line += f"  (p50 {change:+.1f}% vs baseline)"
+        print(f"{key:24} {line}")
+    print(f"{'turns':24} {summary['turns']} in {summary['wall_seconds']:.1f}s, "
+          f"{summary['turns_per_second']:.2f} turns/s, errors={summary['errors']}")
+    if summary["turns_with_token_counts"] < summary["turns"]:
+        print(f"{'':24} token counts unavailable for "
+              f"{summary['turns'] - summary['turns_with_token_counts']} turn(s) (cached or no model call)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded chat_logs and report chat-path latency.")
+    parser.add_argument("--target", choices=["cli", "django"], default="cli",
+                        help="terminal-bot loop, or chat.ai_logic (needs DJANGO_SETTINGS_MODULE)")
+    parser.add_argument("--server", choices=["auto", "fake", "real"], default="auto",
+                        help="auto uses a real Ollama at --base-url when one answers, else the fake")
+    parser.add_argument("--base-url", default=os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434"))
+    parser.add_argument("--model", default="llama3.2:3b")
+    parser.add_argument("--users", type=int, default=4, help="concurrent virtual users")
+    parser.add_argument("--sessions", type=int, default=0, help="replay only this many sessions (0 = all)")
+    parser.add_argument("--logs", nargs="+", default=DEFAULT_LOGS, help="chat_logs directories")
+    parser.add_argument("--tokens-per-second", type=float, default=30.0, help="fake server generation speed")
+    parser.add_argument("--prompt-tps", type=float, default=400.0, help="fake server prompt-eval speed")
+    parser.add_argument("--reply-tokens", type=int, default=120, help="fake server reply length")
+    parser.add_argument("--latency", type=float, default=0.0, help="fake server fixed delay per call")
+    parser.add_argument("--compare", help="earlier results JSON to diff against")
+    parser.add_argument("--output", help="results file (default bench/results/<time>-<commit>.json)")
+    args = parser.parse_args()
+
+    server = None
+    if args.server == "fake" or (args.server == "auto" and not _server_reachable(args.base_url)):
+        server = FakeOllama(tokens_per_second=args.tokens_per_second, prompt_tps=args.prompt_tps,
+                            reply_tokens=args.reply_tokens, latency=args.latency).start()
+        args.base_url = server.base_url
+    # llm_client reads the host at import time
+    os.environ["OLLAMA_BASE_URL"] = args.base_url
+
+    if args.target == "django":
+        import django
+        django.setup()
+        target = replay_django
+    else:
+        target = replay_cli
+
+    sessions = load_sessions(args.logs)
+    if args.sessions:
+        sessions = sessions[:args.sessions]
+    print(f"Replaying {len(sessions)} session(s) with {args.users} user(s) against "
+          f"{'fake' if server else 'real'} Ollama at {args.base_url}")
+
+    results, errors, wall_seconds = run(target, sessions, args.users, args.model)
+    summary = summarize(results, errors, wall_seconds)
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)["summary"]
+    _print_summary(summary, previous)
+    for error in errors[:5]:
+        print(f"  error: {error}")
+
+    commit = _git_commit()
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}-{commit or 'nogit'}-{args.target}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "commit": commit,
+            "timestamp": datetime.now().isoformat(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("compare", "output")},
+            "server": "fake" if server else "real",
+            "summary": summary,
+            "turns": results,
+        }, f, indent=2)
+    print(f"Results saved to {output}")
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import logging
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from langchain_core.messages import SystemMessage
+from langchain_core.prompts import ChatPromptTemplate
+
+from about.models import About
+from chat.ai_models import EntityBriefing, GenerationStats, ProfileEntities
+from chat.generation_stats import record_generation
+from chat.profile_prompt import profile_key
+from chat.scheduler import BATCH, get_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Bump when a prompt changes so old entities/briefings stop matching
+PROMPT_VERSION = 1
+TTL_SECONDS = getattr(settings, "CHAT_BRIEFING_TTL_SECONDS", 12 * 3600)
+MAX_ENTITIES = 6
+
+# Short "update me on my team" style turns are answered with the briefing itself
+UPDATE_WORDS = ("update", "news", "latest", "how is", "how are", "how's", "doing", "recap", "catch me up")
+SERVE_MAX_WORDS = 14
+
+extract_prompt = ChatPromptTemplate.from_template(
+    "List the sports teams and individual players this coach says they follow, support or admire.\n"
+    'Answer with JSON only, like {{"teams": ["..."], "players": ["..."]}}. Use [] when none are named.\n\n'
+    "Sport: {sport}\nProfile:\n{details}"
+)
+briefing_prompt = ChatPromptTemplate.from_template(
+    "Write a briefing for a {sport} coach about the {kind} {name}: recent form and results, key people, "
+    "injuries or changes, and one thing a coach can take from them. One casual, detailed paragraph."
+)
+
+_entities = {}  # profile entities key -> entities, per-process copy of the table
+
+
+def _router():
+    from chat.ai_logic import router
+    return router
+
+
+def _entities_key(about):
+    return profile_key(about.sport_coach, about.details, f"entities-v{PROMPT_VERSION}")
+
+
+def briefing_key(kind, name, sport, model):
+    raw = "\x1f".join([kind, " ".join(name.lower().split()), (sport or "").lower(), model, str(PROMPT_VERSION)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def parse_entities(text):
+    # Tolerates prose around the JSON; returns [] when nothing usable came back
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    try:
+        data = json.loads(match.group(0)) if match else {}
+    except ValueError:
+        return []
+    entities = []
+    seen = set()
+    for kind, field in (("team", "teams"), ("player", "players")):
+        for name in data.get(field) or []:
+            if isinstance(name, str) and name.strip() and (kind, name.lower()) not in seen:
+                seen.add((kind, name.lower()))
+                entities.append({"kind": kind, "name": name.strip()})
+    return entities[:MAX_ENTITIES]
+
+
+def extract_entities(about):
+    # Followed teams/players for a profile; one small-model call per distinct profile
+    key = _entities_key(about)
+    row = ProfileEntities.objects.filter(key=key).values_list("entities", flat=True).first()
+    if row is not None:
+        return row
+    router = _router()
+    with get_scheduler(router.small).slot(BATCH):
+        message = (extract_prompt | router.llm(router.small)).invoke(
+            {"sport": about.sport_coach, "details": about.details}
+        )
+    record_generation(message.response_metadata, GenerationStats.KIND_ENTITIES, router.small, user=about.user)
+    entities = parse_entities(message.content)
+    ProfileEntities.objects.get_or_create(key=key, defaults={"entities": entities})
+    return entities
+
+
+def refresh_briefing(kind, name, sport):
+    # Briefings are the analysis-heavy part, so they use the large model
+    router = _router()
+    model = router.large
+    with get_scheduler(model).slot(BATCH):
+        message = (briefing_prompt | router.llm(model)).invoke({"kind": kind, "name": name, "sport": sport or "sports"})
+    record_generation(message.response_metadata, GenerationStats.KIND_BRIEFING, model)
+    now = timezone.now()
+    EntityBriefing.objects.update_or_create(
+        key=briefing_key(kind, name, sport, model),
+        defaults={
+            "kind": kind, "name": name, "sport": sport or "", "briefing": message.content.strip(),
+            "generated_at": now, "expires_at": now + timedelta(seconds=TTL_SECONDS),
+        },
+    )
+
+
+def refresh_all(force=False):
+    # Batch job: collect every followed entity across profiles, then generate each
+    # missing or stale briefing once, however many coaches follow it
+    model = _router().large
+    wanted = {}
+    for about in About.objects.select_related("user").iterator(chunk_size=200):
+        try:
+            entities = extract_entities(about)
+        except Exception:
+            logger.exception("Entity extraction failed for About %s", about.id)
+            continue
+        for entity in entities:
+            key = briefing_key(entity["kind"], entity["name"], about.sport_coach, model)
+            wanted.setdefault(key, (entity["kind"], entity["name"], about.sport_coach))
+
+    fresh = set()
+    if not force:
+        fresh = set(EntityBriefing.objects.filter(key__in=list(wanted), expires_at__gt=timezone.now())
+                    .values_list("key", flat=True))
+    counts = {"entities": len(wanted), "fresh": len(fresh), "generated": 0, "failed": 0}
+    for key, (kind, name, sport) in wanted.items():
+        if key in fresh:
+            continue
+        try:
+            refresh_briefing(kind, name, sport)
+            counts["generated"] += 1
+        except Exception:
+            logger.exception("Briefing failed for %s %s", kind, name)
+            counts["failed"] += 1
+    return counts
+
+
+def get_briefings(about):
+    # Fresh briefings for the entities this profile follows; one query on the chat path
+    key = _entities_key(about)
+    if key not in _entities:
+        entities = ProfileEntities.objects.filter(key=key).values_list("entities", flat=True).first()
+        if entities is None:
+            return []  # not extracted yet; the next batch run picks the profile up
+        _entities[key] = entities
+    model = _router().large
+    keys = [briefing_key(e["kind"], e["name"], about.sport_coach, model) for e in _entities[key]]
+    if not keys:
+        return []
+    return list(
+        EntityBriefing.objects.filter(key__in=keys, expires_at__gt=timezone.now())
+        .values("kind", "name", "briefing", "generated_at")
+    )
+
+
+def _mentions(name, lowered):
+    # Whole words only, so "Heat" does not match "heated"
+    return re.search(r"(?<!\w)" + re.escape(" ".join(name.lower().split())) + r"(?!\w)", lowered) is not None
+
+
+def match_briefings(briefings, user_input):
+    # Briefings the message is about: named entities, else "my team"/"my player"
+    lowered = " ".join(user_input.lower().split())
+    named = [b for b in briefings if _mentions(b["name"], lowered)]
+    if named:
+        return named
+    if re.search(r"\b(my|favou?rite) (team|club|side)s?\b", lowered):
+        return [b for b in briefings if b["kind"] == "team"]
+    if re.search(r"\b(my|favou?rite) players?\b", lowered):
+        return [b for b in briefings if b["kind"] == "player"]
+    return []
+
+
+def briefing_reply(briefings, user_input):
+    # The briefing text as the whole answer for short update requests, else None
+    if not briefings or len(user_input.split()) > SERVE_MAX_WORDS:
+        return None
+    lowered = user_input.lower()
+    if not any(word in lowered for word in UPDATE_WORDS):
+        return None
+    return "\n\n".join(b["briefing"] for b in briefings)
+
+
+def briefing_messages(briefings):
+    return [
+        SystemMessage(f"Current briefing on the {b['kind']} {b['name']}:\n{b['briefing']}")
+        for b in briefings
+    ]
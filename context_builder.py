@@ -0,0 +1,86 @@
+import tiktoken
+from django.conf import settings
+from langchain_core.messages import AIMessage, HumanMessage
+
+from chat.models import Message
+from chat.ai_models import MessageTokenCount
+
+# --- budget ---
+# CONTEXT_WINDOW should match the model's num_ctx. REPLY_RESERVE_TOKENS is kept free
+# for the answer; the system prompt and the new user message are always included and
+# history fills whatever is left, newest first.
+CONTEXT_WINDOW = getattr(settings, "CHAT_CONTEXT_WINDOW", 4096)
+REPLY_RESERVE_TOKENS = getattr(settings, "CHAT_REPLY_RESERVE_TOKENS", 1024)
+
+# tiktoken is not the llama tokenizer, so counts are an estimate; the per-message
+# overhead covers the chat-template role markers and leaves a little slack.
+ENCODING_NAME = "cl100k_base"
+MESSAGE_OVERHEAD_TOKENS = 8
+
+_encoding = tiktoken.get_encoding(ENCODING_NAME)
+
+
+def count_tokens(text):
+    return len(_encoding.encode(text, disallowed_special=())) + MESSAGE_OVERHEAD_TOKENS
+
+
+def _history_rows(chat):
+    # One query (Message LEFT JOIN token count) served by the (chat, timestamp) index
+    return (
+        Message.objects.filter(chat=chat)
+        .order_by("-timestamp", "-id")
+        .values_list("id", "sender_id", "content", "token_count__tokens")
+    )
+
+
+def _remaining_budget(system_message, user_input, budget):
+    if budget is None:
+        budget = CONTEXT_WINDOW - REPLY_RESERVE_TOKENS
+    return budget - count_tokens(system_message) - count_tokens(user_input)
+
+
+def _take(row, remaining, user, history, new_counts):
+    # Adds one newest-first row to history; returns the budget left, or None once it is full
+    message_id, sender_id, content, tokens = row
+    if tokens is None:
+        tokens = count_tokens(content)
+        new_counts.append(MessageTokenCount(message_id=message_id, tokens=tokens))
+    if tokens > remaining:
+        return None
+    history.append(HumanMessage(content) if sender_id == user.id else AIMessage(content))
+    return remaining - tokens
+
+
+def build_history(chat, user, system_message, user_input, budget=None, max_messages=None):
+    # Returns [HumanMessage/AIMessage, ...] oldest-first, using cached per-message token counts.
+    # max_messages caps the count too (when long-term memory covers older turns).
+    remaining = _remaining_budget(system_message, user_input, budget)
+    history = []
+    new_counts = []
+    for row in _history_rows(chat).iterator(chunk_size=50):
+        remaining = _take(row, remaining, user, history, new_counts)
+        if remaining is None or len(history) == max_messages:
+            break
+
+    if new_counts:
+        MessageTokenCount.objects.bulk_create(new_counts, ignore_conflicts=True)
+
+    history.reverse()
+    return history
+
+
+async def abuild_history(chat, user, system_message, user_input, budget=None, max_messages=None):
+    # build_history for async callers, using async iteration over the same query
+    remaining = _remaining_budget(system_message, user_input, budget)
+    history = []
+    new_counts = []
+    async for row in _history_rows(chat).aiterator(chunk_size=50):
+        remaining = _take(row, remaining, user, history, new_counts)
+        if remaining is None or len(history) == max_messages:
+            break
+
+    if new_counts:
+        await MessageTokenCount.objects.abulk_create(new_counts, ignore_conflicts=True)
+
+    history.reverse()
+    return history
@@ -0,0 +1,82 @@
+from django.db.models import Count, F, FloatField, Sum, Value
+from django.db.models.functions import Cast, NullIf
+
+from chat.ai_models import GenerationStats
+from chat.llm_client import ollama_stats
+
+NS_PER_SECOND = Value(1e9, output_field=FloatField())
+
+
+def stats_row(metadata, kind, model, chat=None, message=None, user=None):
+    # Unsaved GenerationStats for one generation, so it can join a bulk/atomic write
+    stats = ollama_stats(metadata)
+    return GenerationStats(
+        chat=chat,
+        message=message,
+        user=user,
+        kind=kind,
+        model=stats["model"] or model,
+        done_reason=stats["done_reason"] or "",
+        **{key: stats[key] or 0 for key in stats if key not in ("model", "done_reason")},
+    )
+
+
+def record_generation(metadata, kind, model, chat=None, message=None, user=None):
+    if not metadata:
+        return None
+    row = stats_row(metadata, kind, model, chat=chat, message=message, user=user)
+    row.save()
+    return row
+
+
+def _float_sum(field):
+    return Cast(Sum(field), FloatField())
+
+
+def _usage(queryset, *group_by):
+    # Token usage and generation speed (eval tokens per second of eval time) per group
+    return (
+        queryset.values(*group_by)
+        .annotate(
+            generations=Count("id"),
+            prompt_tokens=Sum("prompt_eval_count"),
+            output_tokens=Sum("eval_count"),
+            prompt_seconds=_float_sum("prompt_eval_duration") / NS_PER_SECOND,
+            eval_seconds=_float_sum("eval_duration") / NS_PER_SECOND,
+            tokens_per_second=_float_sum("eval_count") * NS_PER_SECOND / NullIf(_float_sum("eval_duration"), 0.0),
+            avg_prompt_tokens=_float_sum("prompt_eval_count") / Count("id"),
+        )
+        .order_by(*group_by)
+    )
+
+
+def usage_by_user(since=None):
+    return _usage(_since(since), "user_id", "user__username")
+
+
+def usage_by_chat(since=None, user=None):
+    queryset = _since(since)
+    if user is not None:
+        queryset = queryset.filter(user=user)
+    return _usage(queryset, "chat_id")
+
+
+def usage_by_model(since=None):
+    return _usage(_since(since), "model", "kind")
+
+
+def ballooning_chats(min_avg_prompt_tokens=2500, since=None):
+    # Chats whose replies send unusually large prompts, worst first
+    replies = _since(since).filter(kind=GenerationStats.KIND_REPLY)
+    return (
+        _usage(replies, "chat_id")
+        .filter(avg_prompt_tokens__gte=min_avg_prompt_tokens)
+        .order_by(F("avg_prompt_tokens").desc())
+    )
+
+
+def _since(since):
+    queryset = GenerationStats.objects.all()
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    return queryset
@@ -0,0 +1,167 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# (connect, read) seconds for every call to the backend
+TIMEOUT = (3.05, 10)
+DEFAULT_ABOUT = {"sport_coach": "", "details": ""}
+
+
+class BackendClient:
+    # One pooled requests.Session for the auth backend used by demo_chatbot.py.
+    #   get_about()    - cached for about_ttl seconds, then revalidated with If-None-Match
+    #   save_message() - queued; a background thread sends saves in order, in batches,
+    #                    retrying with backoff, so the UI never waits on the remote API;
+    #                    saves still queued when the process exits are sent by close()
+
+    def __init__(self, base_url, headers=None, timeout=TIMEOUT, about_ttl=300,
+                 batch_size=20, flush_interval=0.5, max_attempts=5):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.about_ttl = about_ttl
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        # Idempotent GETs are retried by urllib3; POSTs are retried by the save worker
+        retry = Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504), allowed_methods=("GET",))
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._about_lock = threading.Lock()
+        self._about = None
+        self._about_etag = None
+        self._about_fetched = 0.0
+
+        self._saves = queue.Queue()
+        self._closed = threading.Event()
+        self.stats = {"saved": 0, "retried": 0, "dropped": 0}
+        self._worker = threading.Thread(target=self._run, name="backend-saves", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    # --- reads ---
+
+    def get_about(self):
+        with self._about_lock:
+            if self._about is not None and time.monotonic() - self._about_fetched < self.about_ttl:
+                return self._about
+            headers = {"If-None-Match": self._about_etag} if self._about_etag else {}
+            try:
+                res = self.session.get(f"{self.base_url}/api/about/", headers=headers, timeout=self.timeout)
+                if res.status_code == 304 and self._about is not None:
+                    self._about_fetched = time.monotonic()
+                elif res.status_code == 200:
+                    self._about = res.json()
+                    self._about_etag = res.headers.get("ETag")
+                    self._about_fetched = time.monotonic()
+                else:
+                    logger.warning("Fetching about returned %s", res.status_code)
+            except (requests.RequestException, ValueError) as e:
+                # Keep serving the last good copy while the backend is unreachable
+                logger.warning("Error fetching about: %s", e)
+            return self._about if self._about is not None else dict(DEFAULT_ABOUT)
+
+    def invalidate_about(self):
+        with self._about_lock:
+            self._about_fetched = 0.0
+
+    # --- writes ---
+
+    def create_chat_detail(self, topic_summary="Personalized coaching chat"):
+        # Needed before the first message, so this one stays synchronous (with a timeout)
+        payload = {"topic_summary": topic_summary, "participants": []}
+        try:
+            res = self.session.post(f"{self.base_url}/api/chat-detail/", json=payload, timeout=self.timeout)
+            if res.status_code == 201:
+                return res.json()["id"]
+            logger.warning("Creating chat session returned %s", res.status_code)
+        except (requests.RequestException, ValueError, KeyError) as e:
+            logger.warning("Error creating chat session: %s", e)
+        return None
+
+    def save_message(self, chat_id, content):
+        # Returns immediately; see flush() to wait for delivery
+        self._saves.put({"chat": chat_id, "content": content})
+
+    def flush(self, timeout=None):
+        # Blocks until every queued save was sent or dropped; False on timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._saves.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def close(self, timeout=10):
+        # Sends whatever is still queued (waiting up to timeout seconds), then stops the worker
+        if self._closed.is_set():
+            return
+        atexit.unregister(self.close)
+        self._closed.set()
+        self._saves.put(None)  # ends the worker's wait for more saves
+        self._worker.join(timeout)
+        if self._worker.is_alive():
+            logger.warning("%d message save(s) not sent before close", self._saves.unfinished_tasks)
+        self.session.close()
+
+    def _next_batch(self):
+        # Waits for one save, then gathers whatever else arrives within flush_interval.
+        # Once closed, only what is already queued is gathered.
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            if self._closed.is_set():
+                deadline = time.monotonic()
+            try:
+                if deadline is None:
+                    payload = self._saves.get()
+                else:
+                    payload = self._saves.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if payload is None:
+                self._saves.task_done()
+                continue
+            batch.append(payload)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+        return batch
+
+    def _run(self):
+        while not (self._closed.is_set() and self._saves.empty()):
+            batch = self._next_batch()
+            # The API takes one message per POST; a batch is sent back to back over
+            # the same kept-alive connection, in order
+            for payload in batch:
+                self._send(payload)
+                self._saves.task_done()
+
+    def _send(self, payload):
+        for attempt in range(self.max_attempts):
+            try:
+                res = self.session.post(f"{self.base_url}/api/chat-history/", json=payload, timeout=self.timeout)
+                if res.status_code < 400:
+                    self.stats["saved"] += 1
+                    return
+                if res.status_code < 500 and res.status_code != 429:
+                    # Client errors will not get better by retrying
+                    logger.warning("Dropping message save, backend returned %s", res.status_code)
+                    break
+            except requests.RequestException as e:
+                logger.warning("Error saving message (attempt %d): %s", attempt + 1, e)
+            if attempt + 1 < self.max_attempts:
+                self.stats["retried"] += 1
+                time.sleep(min(30, 0.5 * 2 ** attempt))
+        self.stats["dropped"] += 1
@@ -1,17 +1,31 @@
+import os
+import sys
+
 import streamlit as st
-from langchain_ollama import ChatOllama
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+# llm_client.py lives in the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_client import get_llm
+
+# Only the most recent messages go to the model, so long sessions keep a bounded prompt
+MAX_HISTORY_MESSAGES = 20
 
 st.title("llama-3.2 Chat-bot")
 
-model = ChatOllama(model="llama3.2:3b", base_url="http://localhost:11434")
+
+@st.cache_resource
+def get_chain():
+    # Built once per server process, not on every rerun. The history goes in through
+    # MessagesPlaceholder, so message text is never parsed as a template.
+    chat_template = ChatPromptTemplate.from_messages([MessagesPlaceholder("messages")])
+    return chat_template | get_llm("llama3.2:3b") | StrOutputParser()
 
 
 def generate_response(messages):
-    chat_template = ChatPromptTemplate.from_messages(messages)
-    chain = chat_template | model | StrOutputParser()
-    return chain.invoke({})
+    # Yields text chunks as the model produces them
+    return get_chain().stream({"messages": messages[-MAX_HISTORY_MESSAGES:]})
 
 
 if "messages" not in st.session_state:
@@ -30,8 +44,7 @@ if prompt := st.chat_input("What is up?"):
     st.session_state.messages.append({"role": "user", "content": prompt})
 
     
-    with st.chat_message("assistant"), st.spinner("Generating response..."):
-        response = generate_response(st.session_state.messages)
-        st.markdown(response)
+    with st.chat_message("assistant"):
+        response = st.write_stream(generate_response(st.session_state.messages))
 
     st.session_state.messages.append({"role": "assistant", "content": response})
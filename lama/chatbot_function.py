@@ -1,61 +1,63 @@
-from langchain_ollama import ChatOllama
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.output_parsers import StrOutputParser
 
 from chat.models import Chat, Message
 from about.models import About
 from django.utils import timezone
+from chat.llm_client import get_llm
 
 from datetime import timedelta
 
 # LLM 
-llm = ChatOllama(model="llama3.2:3b", 
-                 base_url="http://localhost:11434",
-                 temperature=0.7,
-                 top_k=40,
-                 top_p=0.9,
-                 repeat_penalty=1.1,
-                 num_ctx=4096
-                 )
+llm = get_llm("llama3.2:3b",
+              temperature=0.7,
+              top_k=40,
+              top_p=0.9,
+              repeat_penalty=1.1,
+              num_ctx=4096)
 output_parser = StrOutputParser()
 
-def generate_response_from_chat(chat, user, user_input): 
-    # 1. Getting About info 
-    try:
-        about = user.about
-    except About.DoesNotExist:
-        return "User profile missing. Please complete your About section.", ""
-
-    # 2. system prompt based on user profile
-        # ---- Personalized system prompt ----
-    system_message = f"""
+# ---- Personalized prompt, compiled once; profile, history and input are filled in as values ----
+chat_prompt = ChatPromptTemplate.from_messages([
+    ("system", """
     You are a concise, smart, and context-aware assistant who gives sharp, relevant replies only.
-    This user is a sports coach. They specialize in: **{about.sport_coach}**.
+    This user is a sports coach. They specialize in: **{sport}**.
     Here’s what the user said about themselves:
     ---
-    {about.details}
+    {details}
     ---
     Use this info to personalize your tone, advice, examples, and especially team-specific responses.
     If they ask about "my team", infer from the text above.
     Do not give general explanations. Focus only on what they ask.
     Keep answers short and inline unless explicitly asked for depth.
-    """
+    """),
+    MessagesPlaceholder("history"),
+    ("human", "{user_input}"),
+])
 
-    # 3. Loading existing chat history from Message table
-    chat_history = [("system", system_message)]
+def generate_response_from_chat(chat, user, user_input): 
+    # 1. Getting About info 
+    try:
+        about = user.about
+    except About.DoesNotExist:
+        return "User profile missing. Please complete your About section.", ""
+
+    # 2-3. Loading existing chat history from Message table as message objects
+    chat_history = []
     messages = Message.objects.filter(chat=chat).order_by("timestamp")
 
     for msg in messages:
-        role = "user" if msg.sender == user else "assistant"
-        chat_history.append((role, msg.content))
-
-    # 4. Addding current user input
-    chat_history.append(("user", user_input))
+        chat_history.append(HumanMessage(msg.content) if msg.sender == user else AIMessage(msg.content))
 
-    # 5. Building LangChain pipeline
-    prompt = ChatPromptTemplate.from_messages(chat_history)
-    chain = prompt | llm | output_parser
-    response = chain.invoke({}).strip()
+    # 4-5. Filling the compiled prompt (system prompt from the profile + history + current input)
+    chain = chat_prompt | llm | output_parser
+    response = chain.invoke({
+        "sport": about.sport_coach,
+        "details": about.details,
+        "history": chat_history,
+        "user_input": user_input,
+    }).strip()
 
     # 6. Saving both user and assistant messages to DB
     Message.objects.create(chat=chat, sender=user, content=user_input)
@@ -0,0 +1,203 @@
+import argparse
+import glob
+import os
+import sqlite3
+import time
+
+from log_store import iter_segment, load_profiles, load_session_file, load_summaries, segment_paths
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INDEX_PATH = os.path.join(REPO_ROOT, "lama", "chat_logs", "index.sqlite3")
+# Old one-file-per-session logs, plus the append-only stores the bots write now
+JSON_DIRS = [os.path.join(REPO_ROOT, "chat_logs"), os.path.join(REPO_ROOT, "lama", "chat_logs")]
+STORE_DIRS = [os.path.join(d, "store") for d in JSON_DIRS]
+
+# Bumped whenever SCHEMA changes; an older index is dropped and rebuilt from the logs
+SCHEMA_VERSION = 2
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, mtime REAL, size INTEGER, records INTEGER
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    session TEXT PRIMARY KEY, source TEXT, username TEXT, sport TEXT, timestamp TEXT, summary TEXT
+);
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY, session TEXT, username TEXT, sport TEXT, timestamp TEXT,
+    role TEXT, content TEXT, source TEXT
+);
+CREATE INDEX IF NOT EXISTS turns_user_time ON turns(username, timestamp);
+CREATE INDEX IF NOT EXISTS turns_source ON turns(source);
+-- username is indexed too, so a per-user search only visits that user's postings
+CREATE VIRTUAL TABLE IF NOT EXISTS turns_fts USING fts5(
+    content, username, content='turns', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS turns_ai AFTER INSERT ON turns BEGIN
+    INSERT INTO turns_fts(rowid, content, username) VALUES (new.id, new.content, new.username);
+END;
+CREATE TRIGGER IF NOT EXISTS turns_ad AFTER DELETE ON turns BEGIN
+    INSERT INTO turns_fts(turns_fts, rowid, content, username)
+    VALUES ('delete', old.id, old.content, old.username);
+END;
+"""
+OPERATORS = {"AND", "OR", "NOT"}
+
+
+def connect(path=INDEX_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        # Everything in the index can be rebuilt from the logs, so start over
+        conn.executescript(
+            "DROP TABLE IF EXISTS turns_fts; DROP TABLE IF EXISTS turns;"
+            " DROP TABLE IF EXISTS sessions; DROP TABLE IF EXISTS files;"
+        )
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _fts_string(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def fts_query(query):
+    # Each word becomes an FTS5 string, so "C++" or "warriors-update" are searched as
+    # text instead of being parsed as query syntax; AND/OR/NOT between words still work
+    words = query.split()
+    parts = []
+    for i, word in enumerate(words):
+        operator = word in OPERATORS and 0 < i < len(words) - 1 and parts[-1] not in OPERATORS
+        parts.append(word if operator else _fts_string(word))
+    return " ".join(parts)
+
+
+def _file_state(conn, path):
+    return conn.execute("SELECT mtime, size, records FROM files WHERE path = ?", (path,)).fetchone()
+
+
+def _ingest_json_file(conn, path, already_indexed):
+    # A rewritten JSON file replaces everything previously indexed from it
+    conn.execute("DELETE FROM turns WHERE source = ?", (path,))
+    session = load_session_file(path)
+    session_id = os.path.splitext(os.path.basename(path))[0]
+    conn.execute(
+        "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?)",
+        (session_id, path, session.get("username"), session.get("sport"),
+         session.get("timestamp"), session.get("summary")),
+    )
+    conn.executemany(
+        "INSERT INTO turns (session, username, sport, timestamp, role, content, source)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (session_id, session.get("username"), session.get("sport"),
+             turn.get("timestamp") or session.get("timestamp"),
+             turn.get("role"), turn.get("content", ""), path)
+            for turn in session.get("chat_details", [])
+        ],
+    )
+    return 0
+
+
+def _ingest_segment(conn, path, already_indexed):
+    # Segments are append-only, so only records past the last indexed one are new
+    count = 0
+    profiles = load_profiles(os.path.dirname(path))
+    for record in iter_segment(path):
+        count += 1
+        if count <= already_indexed:
+            continue
+        kind = record["type"]
+        if kind == "session":
+            sport = profiles.get(record["profile"], {}).get("sport")
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, NULL)",
+                (record["session"], path, record["username"], sport, record["timestamp"]),
+            )
+        elif kind == "turn":
+            # Turns written before LogStore stamped them fall back to the session start
+            conn.execute(
+                "INSERT INTO turns (session, username, sport, timestamp, role, content, source)"
+                " SELECT session, username, sport, COALESCE(?, timestamp), ?, ?, ? FROM sessions"
+                " WHERE session = ?",
+                (record.get("timestamp"), record["role"], record["content"], path, record["session"]),
+            )
+        elif kind == "end" and "summary" in record:
+            conn.execute("UPDATE sessions SET summary = ? WHERE session = ?", (record["summary"], record["session"]))
+    return count
+
+
+def _ingest_summaries(conn, path, already_indexed):
+    # Backfilled summaries (LogStore.set_summary); the file is small, so all of them are
+    # applied again, the latest per session
+    summaries = load_summaries(os.path.dirname(path))
+    conn.executemany("UPDATE sessions SET summary = ? WHERE session = ?",
+                     [(summary, session) for session, summary in summaries.items()])
+    return len(summaries)
+
+
+def update(conn, json_dirs=JSON_DIRS, store_dirs=STORE_DIRS):
+    # Incremental: files whose (mtime, size) haven't changed are skipped. Summaries go
+    # last, after the sessions they belong to.
+    changed = 0
+    paths = [(p, _ingest_json_file) for d in json_dirs for p in sorted(glob.glob(os.path.join(d, "*.json")))]
+    paths += [(p, _ingest_segment) for d in store_dirs for p in segment_paths(d)]
+    paths += [(os.path.join(d, "summaries.jsonl"), _ingest_summaries) for d in store_dirs
+              if os.path.exists(os.path.join(d, "summaries.jsonl"))]
+    for path, ingest in paths:
+        stat = os.stat(path)
+        state = _file_state(conn, path)
+        if state and state[0] == stat.st_mtime and state[1] == stat.st_size:
+            continue
+        with conn:
+            records = ingest(conn, path, state[2] if state else 0)
+            conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                (path, stat.st_mtime, stat.st_size, records),
+            )
+        changed += 1
+    return changed
+
+
+def search(conn, query, username=None, sport=None, role=None, since=None, until=None, limit=20):
+    sql = (
+        "SELECT t.username, t.timestamp, t.role, snippet(turns_fts, 0, '[', ']', '…', 16), t.source"
+        " FROM turns_fts JOIN turns t ON t.id = turns_fts.rowid"
+        " WHERE turns_fts MATCH ?"
+    )
+    match = fts_query(query)
+    if username:
+        match = f"username : {_fts_string(username)} AND ({match})"
+    params = [match]
+    for column, op, value in (("username", "=", username), ("sport", "=", sport), ("role", "=", role),
+                              ("timestamp", ">=", since), ("timestamp", "<", until)):
+        if value:
+            sql += f" AND t.{column} {op} ?"
+            params.append(value)
+    sql += " ORDER BY rank LIMIT ?"
+    params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index chat logs and search them.")
+    parser.add_argument("query", nargs="?", help="words to find, e.g. 'warriors' or 'curry OR injury'")
+    parser.add_argument("--user", help="username, e.g. coach_james")
+    parser.add_argument("--sport")
+    parser.add_argument("--role", choices=["user", "assistant"])
+    parser.add_argument("--since", help="ISO date of the turn, e.g. 2025-07-01")
+    parser.add_argument("--until", help="ISO date (exclusive)")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--no-update", action="store_true", help="search the index as it is")
+    args = parser.parse_args()
+
+    conn = connect()
+    if not args.no_update:
+        started = time.perf_counter()
+        changed = update(conn)
+        print(f"Indexed {changed} changed file(s) in {(time.perf_counter() - started) * 1000:.0f} ms")
+    if args.query:
+        started = time.perf_counter()
+        rows = search(conn, args.query, args.user, args.sport, args.role, args.since, args.until, args.limit)
+        for username, timestamp, role, snippet, source in rows:
+            print(f"{timestamp}  {username}  {role}: {snippet}\n    {source}")
+        print(f"{len(rows)} match(es) in {(time.perf_counter() - started) * 1000:.1f} ms")
@@ -0,0 +1,195 @@
+import glob
+import hashlib
+import io
+import json
+import os
+import uuid
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:  # plain JSONL segments still work without it
+    zstandard = None
+
+_ZSTD_ERRORS = (zstandard.ZstdError,) if zstandard else ()
+
+STORE_DIR = "chat_logs/store"
+MAX_SEGMENT_BYTES = 8 * 1024 * 1024
+
+
+def profile_hash(username, sport, details):
+    raw = "\x1f".join([username, sport, details])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class LogStore:
+    # Append-only chat log. Every record is one JSON line, written and flushed as it
+    # happens, so a crash loses at most the turn being written:
+    #   profiles.jsonl          - each profile once, keyed by content hash
+    #   summaries.jsonl         - summaries written after a session ended (backfills);
+    #                             they replace the one in the session's "end" record
+    #   seg-<time>-<pid>-<n>    - session/turn/end records, rotated at max_segment_bytes
+    # With compress=True each record is its own zstd frame (.jsonl.zst), which keeps
+    # appends O(1) and lets the reader stop cleanly at a truncated last frame.
+
+    def __init__(self, directory=STORE_DIR, compress=True, max_segment_bytes=MAX_SEGMENT_BYTES):
+        self.directory = directory
+        self.compress = compress and zstandard is not None
+        self.max_segment_bytes = max_segment_bytes
+        self._compressor = zstandard.ZstdCompressor(level=9) if self.compress else None
+        self._prefix = f"seg-{datetime.now().strftime('%Y%m%d%H%M%S')}-{os.getpid()}"
+        self._segment_no = 0
+        self._segment = None
+        os.makedirs(directory, exist_ok=True)
+        self._profiles = {p["hash"] for p in _read_jsonl(os.path.join(directory, "profiles.jsonl"))}
+
+    def _open_segment(self):
+        if self._segment is not None:
+            self._segment.close()
+        self._segment_no += 1
+        suffix = ".jsonl.zst" if self.compress else ".jsonl"
+        path = os.path.join(self.directory, f"{self._prefix}-{self._segment_no:04d}{suffix}")
+        self._segment = open(path, "ab")
+
+    def _write(self, record):
+        if self._segment is None or self._segment.tell() >= self.max_segment_bytes:
+            self._open_segment()
+        data = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+        self._segment.write(data)
+        self._segment.flush()
+
+    def start_session(self, user_profile):
+        key = profile_hash(user_profile["username"], user_profile["sport"], user_profile["details"])
+        if key not in self._profiles:
+            with open(os.path.join(self.directory, "profiles.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps({
+                    "hash": key,
+                    "username": user_profile["username"],
+                    "sport": user_profile["sport"],
+                    "details": user_profile["details"],
+                }, ensure_ascii=False) + "\n")
+            self._profiles.add(key)
+
+        session_id = uuid.uuid4().hex
+        self._write({
+            "type": "session",
+            "session": session_id,
+            "username": user_profile["username"],
+            "profile": key,
+            "timestamp": datetime.now().isoformat(),
+        })
+        return session_id
+
+    def append_turn(self, session_id, role, content, **extra):
+        self._write({
+            "type": "turn",
+            "session": session_id,
+            "role": role,
+            "content": content,
+            "timestamp": datetime.now().isoformat(),
+            **extra,
+        })
+
+    def end_session(self, session_id, **fields):
+        self._write({"type": "end", "session": session_id, **fields})
+
+    def set_summary(self, session_id, summary):
+        # For sessions that may already have ended; a second "end" record would be ignored
+        with open(os.path.join(self.directory, "summaries.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps({"session": session_id, "summary": summary}, ensure_ascii=False) + "\n")
+
+    def close(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+
+# --- reader ---
+
+def _read_jsonl(path):
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_segment(path):
+    # Streams the records of one segment file
+    with open(path, "rb") as raw:
+        if path.endswith(".zst"):
+            if zstandard is None:
+                raise RuntimeError(f"zstandard is needed to read {path}")
+            raw = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+        reader = io.TextIOWrapper(raw, encoding="utf-8")
+        try:
+            for line in reader:
+                if line.endswith("\n"):
+                    yield json.loads(line)
+        except _ZSTD_ERRORS:
+            pass  # truncated last frame from a crash; everything before it is intact
+
+
+def segment_paths(directory=STORE_DIR):
+    return sorted(glob.glob(os.path.join(directory, "seg-*")))
+
+
+def iter_records(directory=STORE_DIR):
+    # Streams every record from every segment, oldest segment first
+    for path in segment_paths(directory):
+        yield from iter_segment(path)
+
+
+def load_session_file(path):
+    # Old per-session chat_logs/*.json file. Some have hand-written notes after the
+    # JSON object ("//this response is good too"), so only the first object is read.
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    session, _ = json.JSONDecoder().raw_decode(text.lstrip())
+    return session
+
+
+def load_profiles(directory=STORE_DIR):
+    return {p["hash"]: p for p in _read_jsonl(os.path.join(directory, "profiles.jsonl"))}
+
+
+def load_summaries(directory=STORE_DIR):
+    # session id -> its latest backfilled summary
+    return {r["session"]: r["summary"] for r in _read_jsonl(os.path.join(directory, "summaries.jsonl"))}
+
+
+def iter_sessions(directory=STORE_DIR):
+    # Yields one session dict at a time, in the same shape as the old chat_logs JSON files.
+    # Only sessions that are still open are held in memory.
+    profiles = load_profiles(directory)
+    summaries = load_summaries(directory)
+    open_sessions = {}
+    for record in iter_records(directory):
+        kind = record["type"]
+        if kind == "session":
+            profile = profiles.get(record["profile"], {})
+            open_sessions[record["session"]] = {
+                "session": record["session"],
+                "username": record["username"],
+                "sport": profile.get("sport", ""),
+                "details": profile.get("details", ""),
+                "timestamp": record["timestamp"],
+                "chat_details": [],
+            }
+        elif kind == "turn" and record["session"] in open_sessions:
+            turn = {k: v for k, v in record.items() if k not in ("type", "session")}
+            open_sessions[record["session"]]["chat_details"].append(turn)
+        elif kind == "end" and record["session"] in open_sessions:
+            session = open_sessions.pop(record["session"])
+            session.update({k: v for k, v in record.items() if k not in ("type", "session")})
+            if session["session"] in summaries:
+                session["summary"] = summaries[session["session"]]
+            yield session
+    # Sessions that never got an "end" record (crash, Ctrl-C) are still returned
+    for session in open_sessions.values():
+        if session["session"] in summaries:
+            session["summary"] = summaries[session["session"]]
+        yield session
@@ -0,0 +1,36 @@
+import json
+import os
+
+from langchain_core.output_parsers import StrOutputParser
+
+# profile_prompt.py lives in the repo root (on sys.path like llm_client), shared with chat.profile_digest
+from profile_prompt import digest_prompt, profile_key
+
+CACHE_FILE = "chat_logs/profile_digests.json"
+
+
+def load_digests(path=CACHE_FILE):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def get_profile_digest(user_profile, summarizer, path=CACHE_FILE):
+    # Summarize the profile once per (sport, details, model, prompt version) and reuse it
+    key = profile_key(user_profile["sport"], user_profile["details"], summarizer.model)
+    digests = load_digests(path)
+    if key in digests:
+        return digests[key]
+
+    summary_chain = digest_prompt | summarizer | StrOutputParser()
+    digest = summary_chain.invoke({"details": user_profile["details"]}).strip()
+
+    digests[key] = digest
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(digests, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return digest
@@ -0,0 +1,122 @@
+import logging
+import threading
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.prompts import ChatPromptTemplate
+
+from llm_client import GenerationStream, ollama_stats
+
+logger = logging.getLogger(__name__)
+
+# Rough chars-per-token ratio, only used to decide when a checkpoint is due
+CHARS_PER_TOKEN = 4
+
+compact_prompt = ChatPromptTemplate.from_template(
+    """Summarize this conversation so far.
+    Focus on what the user is asking, what the assistant is saying, and key insights to remember in future replies.
+
+    {chat}"""
+)
+
+
+class PrefixStableHistory:
+    # Keeps the prompt append-only between checkpoints so Ollama can reuse its KV cache:
+    #   [system] [summary of compacted turns, if any] [turns since last checkpoint...]
+    # The system prompt and the summary only change at a checkpoint, which runs when the
+    # estimated prompt size passes max_prompt_tokens, not on every turn.
+    # checkpoint_in_background() does the summarization while the user is typing;
+    # apply_checkpoint() swaps the result in at the start of a later turn.
+
+    def __init__(self, system_message, llm, max_prompt_tokens=3072, keep_recent=4):
+        self.system_message = system_message
+        self.llm = llm
+        self.max_prompt_tokens = max_prompt_tokens
+        self.keep_recent = keep_recent
+        self.summary = ""
+        self.messages = []
+        self._pending = None  # in-flight background checkpoint
+
+    def append(self, role, content):
+        self.messages.append((role, content))
+
+    def estimated_tokens(self):
+        chars = len(self.system_message) + len(self.summary)
+        chars += sum(len(content) for _, content in self.messages)
+        return chars // CHARS_PER_TOKEN
+
+    def needs_checkpoint(self):
+        return (
+            self.estimated_tokens() > self.max_prompt_tokens
+            and len(self.messages) > self.keep_recent
+        )
+
+    def _summarize(self, old_messages, summary):
+        old_chat = "\n".join(f"{role}: {content}" for role, content in old_messages)
+        if summary:
+            old_chat = f"Earlier summary: {summary}\n\n{old_chat}"
+        summary_chain = compact_prompt | self.llm
+        message = summary_chain.invoke({"chat": old_chat})
+        logger.info("Checkpoint summary stats: %s", ollama_stats(message.response_metadata))
+        return message.content.strip()
+
+    def checkpoint(self):
+        # Fold everything but the last keep_recent messages into the summary
+        self.summary = self._summarize(self.messages[:-self.keep_recent], self.summary)
+        self.messages = self.messages[-self.keep_recent:]
+
+    def checkpoint_in_background(self):
+        # Same as checkpoint(), on a thread, over a snapshot of the current messages.
+        # Call it right after a reply is shown; False if no checkpoint is due or one is
+        # already running.
+        if self._pending is not None or not self.needs_checkpoint():
+            return False
+        count = len(self.messages) - self.keep_recent
+        pending = {"count": count, "summary": None}
+
+        def run(old_messages, summary):
+            try:
+                pending["summary"] = self._summarize(old_messages, summary)
+            except Exception as e:
+                # Keep the old summary; the next turn starts another attempt
+                logger.warning("Background checkpoint failed: %s", e)
+
+        pending["thread"] = threading.Thread(
+            target=run, args=(self.messages[:count], self.summary), name="history-checkpoint", daemon=True
+        )
+        self._pending = pending
+        pending["thread"].start()
+        return True
+
+    def apply_checkpoint(self, wait=False):
+        # Swaps in a finished background checkpoint. If it is still running, the turn goes
+        # ahead with the previous summary (and a slightly longer prompt) instead of waiting.
+        pending = self._pending
+        if pending is None:
+            return False
+        if wait:
+            pending["thread"].join()
+        elif pending["thread"].is_alive():
+            return False
+        self._pending = None
+        if pending["summary"] is None:
+            return False
+        # Messages appended since the snapshot stay; only the summarized ones are dropped
+        self.summary = pending["summary"]
+        self.messages = self.messages[pending["count"]:]
+        return True
+
+    def prompt_messages(self):
+        prompt = [SystemMessage(self.system_message)]
+        if self.summary:
+            prompt.append(SystemMessage(f"Summary of earlier conversation:\n{self.summary}"))
+        for role, content in self.messages:
+            prompt.append(HumanMessage(content) if role == "user" else AIMessage(content))
+        return prompt
+
+    def invoke(self, deadline=None):
+        # Returns the reply plus Ollama's prompt/eval counters for this call. A low
+        # prompt_eval_count relative to the prompt size means the prefix was reused.
+        # Ctrl-C or the deadline stops the generation; stats["done_reason"] then says
+        # "cancelled"/"deadline" and the reply is the part generated so far.
+        generation = GenerationStream(self.llm, self.prompt_messages(), deadline).run(stop_on_interrupt=True)
+        return generation.text, ollama_stats(generation.metadata)
@@ -2,26 +2,30 @@
 import sys
 import time
 import threading
-import json
-from datetime import datetime
 import os
 
-from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
 from mock_users import USER_PROFILES 
 
+# llm_client.py lives in the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_client import CANCELLED, DEADLINE, get_llm, ollama_stats, warm_up_in_background
+from log_store import LogStore
+from prompt_layout import PrefixStableHistory
+
 # --- Model setup ---
-llm = ChatOllama(
-    model="mistral:7b-instruct-q4_K_M", 
-    base_url="http://localhost:11434",
+llm = get_llm(
+    "mistral:7b-instruct-q4_K_M",
     temperature=0.7,
     top_k=40,
     top_p=0.9,
     repeat_penalty=1.1,
     num_ctx=4096
 )
-output_parser = StrOutputParser()
+
+# --- Optional: load the model while the user picks a profile (run with --warm-up) ---
+if "--warm-up" in sys.argv:
+    warm_up_in_background([llm.model])
 
 # --- Select user ---
 print("Available users:")
@@ -34,17 +38,13 @@ if selected_user not in USER_PROFILES:
     exit()
 
 user_profile = USER_PROFILES[selected_user]
-chat_history = []
-chat_summary = ""  # Running summary
-
-# --- JSON logging ---
-chat_log = {
-    "username": user_profile["username"],
-    "sport": user_profile["sport"],
-    "details": user_profile["details"],
-    "timestamp": datetime.now().isoformat(),
-    "chat_details": []
-}
+
+# Turns so far, for the final summary
+turns = []
+
+# Each turn is appended to the log store as it happens, so Ctrl-C or a crash keeps the session
+log_store = LogStore()
+session_id = log_store.start_session(user_profile)
 
 # --- Base system prompt ---
 system_message = f"""
@@ -64,6 +64,9 @@ Use this info to personalize your answers. When they ask about:
 Avoid sounding like a news presenter. Be casual, insightful, and sport-specific.
 """
 
+# 🧠 Append-only prompt: system + summary of compacted turns + turns since the last checkpoint
+history = PrefixStableHistory(system_message, llm)
+
 print(f"\n🟢 Chat started for: {user_profile['username']}")
 print("Type 'exit' to quit.\n")
 
@@ -86,71 +89,53 @@ while True:
         print("Goodbye! 👋")
         break
 
-    chat_history.append(("user", user_input))
-    chat_log["chat_details"].append({"role": "user", "content": user_input})
-
-    # ⏳ Summarize if needed
-    if len(chat_history) > 6:
-        old_chat = "\n".join([f"{r[0]}: {r[1]}" for r in chat_history[:-4]])
-        summary_prompt = ChatPromptTemplate.from_template(
-        """Summarize this conversation so far. 
-        Focus on what the user is asking, what the assistant is saying, and key insights to remember in future replies.
+    history.append("user", user_input)
+    turns.append({"role": "user", "content": user_input})
+    log_store.append_turn(session_id, "user", user_input)
 
-        {chat}"""
-        )
-
-        summary_chain = summary_prompt | llm | output_parser
-        chat_summary = summary_chain.invoke({"chat": old_chat}).strip()
-
-    # 🔁 Build updated system message
-    dynamic_system_message = system_message
-    if chat_summary:
-        dynamic_system_message += f"\n\nSummary of earlier conversation:\n{chat_summary}"
-
-    # 🧠 Only keep last 4–5 messages
-    recent_history = chat_history[-5:]
-
-    prompt = ChatPromptTemplate.from_messages(
-        [("system", dynamic_system_message)] + recent_history
-    )
-    chain = prompt | llm | output_parser
+    # ⏳ Use the summary compacted while the coach was typing, if it is ready; otherwise
+    # this turn keeps the previous one. Either way the prefix only changes at checkpoints.
+    history.apply_checkpoint()
 
     # Show animation
     stop_thinking = False
     t = threading.Thread(target=show_thinking_animation)
     t.start()
 
-    # Get model output
-    response = chain.invoke({})
+    # Get model output (Ctrl-C stops this reply, not the chat)
+    response, stats = history.invoke()
 
     stop_thinking = True
     t.join()
 
-    print(f": {response.strip()}\n")
-    chat_history.append(("assistant", response.strip()))
-    chat_log["chat_details"].append({"role": "assistant", "content": response.strip()})
+    stopped = " [stopped]" if stats["done_reason"] in (CANCELLED, DEADLINE) else ""
+    print(f": {response}{stopped}\n")
+    history.append("assistant", response)
+    turns.append({"role": "assistant", "content": response})
+    log_store.append_turn(session_id, "assistant", response, stats=stats)
+
+    # 🧠 Compact in the background while the coach reads and types the next message
+    history.checkpoint_in_background()
 
 # --- FINAL SUMMARY ---
+history.apply_checkpoint(wait=True)
 formatted_chat = "\n".join([
-    f"{msg['role'].capitalize()}: {msg['content']}" for msg in chat_log["chat_details"]
+    f"{msg['role'].capitalize()}: {msg['content']}" for msg in turns
 ])
 
 summary_prompt = ChatPromptTemplate.from_template(
     "Summarize this conversation into a single paragraph. Focus on what the user asked, what they were interested in, and what the assistant provided:\n\n{chat}"
 )
-summary_chain = summary_prompt | llm | output_parser
-summary_text = summary_chain.invoke({"chat": formatted_chat}).strip()
-chat_log["summary"] = summary_text
-chat_log["intermediate_summary"] = chat_summary
+summary_chain = summary_prompt | llm
+summary_message = summary_chain.invoke({"chat": formatted_chat})
+summary_text = summary_message.content.strip()
+summary_stats = ollama_stats(summary_message.response_metadata)
 
 print("\nGenerated Summary:\n")
 print(summary_text)
 
-# --- Save to JSON ---
-filename = f"chat_logs/{user_profile['username']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-os.makedirs("chat_logs", exist_ok=True)
-
-with open(filename, "w", encoding="utf-8") as f:
-    json.dump(chat_log, f, ensure_ascii=False, indent=2)
+# --- Close the session in the log store ---
+log_store.end_session(session_id, summary=summary_text, summary_stats=summary_stats, intermediate_summary=history.summary)
+log_store.close()
 
-print(f"\nThe chat is saved to: {filename}")
+print(f"\nThe chat is saved to: {log_store.directory}")
@@ -2,27 +2,27 @@
 import sys
 import time
 import threading
-#for json
-import json
-from datetime import datetime
 import os
 
-from langchain_ollama import ChatOllama
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.messages import AIMessage, HumanMessage
 from mock_users import USER_PROFILES 
-#for memory summary
-from langchain.memory import ConversationSummaryBufferMemory
-from langchain_community.chat_message_histories import ChatMessageHistory
+
+# llm_client.py lives in the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_client import GenerationStream, get_llm, ollama_stats, warm_up_in_background
+from model_router import CHAT, SUMMARY, ModelRouter
+from log_store import LogStore
+from profile_digest import get_profile_digest
 
 # --- model ---
 #ollama pull mistral:7b-instruct-q4_K_M
 # --- Summarize user details ---
 # Summarizer model
 # --- Model Initialization ---
-llm = ChatOllama(
-    model="mistral:7b-instruct-v0.3-q3_K_M",
-    base_url="http://localhost:11434",
+# Analysis turns go to mistral, follow-ups and summaries to the small model
+router = ModelRouter(
+    large="mistral:7b-instruct-v0.3-q3_K_M",
     temperature=0.7,
     top_k=40,
     top_p=0.9,
@@ -31,9 +31,8 @@ llm = ChatOllama(
 )
 
 # Summarizer model (lighter settings)
-summarizer = ChatOllama(
-    model="mistral:7b-instruct-v0.3-q3_K_M",
-    base_url="http://localhost:11434",
+summarizer = get_llm(
+    router.small,
     temperature=0.3,
     top_k=20,
     top_p=0.85,
@@ -41,7 +40,10 @@ summarizer = ChatOllama(
     num_ctx=1024
 )
 
-output_parser = StrOutputParser()
+
+# --- Optional: load the model while the user picks a profile (run with --warm-up) ---
+if "--warm-up" in sys.argv:
+    warm_up_in_background([router.small, router.large])
 
 # --- Select user (simulate login) ---
 print("Available users:")
@@ -56,25 +58,19 @@ if selected_user not in USER_PROFILES:
 
 user_profile = USER_PROFILES[selected_user]
 
-# --- Summarize user profile ---
-summary_prompt = ChatPromptTemplate.from_template(
-    "Summarize this user profile in 2 sentences, preserving coaching values and favorite players:\n\n{details}"
-)
-summary_chain = summary_prompt | summarizer | output_parser
-short_user_details = summary_chain.invoke({"details": user_profile["details"]})
+# --- Summarize user profile (cached on disk, so only the first run calls the model) ---
+short_user_details = get_profile_digest(user_profile, summarizer)
 
 #print(f"\n--- User profile summary ---\n{short_user_details}\n")
 
 chat_history = []
 
-# ----------for json--------------
-chat_log = {
-    "username": user_profile["username"],
-    "sport": user_profile["sport"],
-    "details": user_profile["details"],
-    "timestamp": datetime.now().isoformat(),
-    "chat_details": []
-} 
+# Turns so far, for the final summary
+turns = []
+
+# Each turn is appended to the log store as it happens, so Ctrl-C or a crash keeps the session
+log_store = LogStore()
+session_id = log_store.start_session(user_profile)
 
 # --- Personalized system message ---
 system_message = f"""
@@ -112,6 +108,11 @@ def show_thinking_animation():
             time.sleep(0.4)
     sys.stdout.write("\r" + " " * 30 + "\r") 
 
+# --- Prompt, compiled once per session/profile; history goes in as message objects ---
+chat_prompt = ChatPromptTemplate.from_messages(
+    [("system", "{system_message}"), MessagesPlaceholder("history")]
+).partial(system_message=system_message)
+
 # --- Chat loop ---
 while True:
     user_input = input("You: ")
@@ -119,50 +120,50 @@ while True:
         print("Goodbye! 👋")
         break
 
-    chat_history.append(("user", user_input))
-    chat_log["chat_details"].append({"role":"user","content":user_input})
-    prompt = ChatPromptTemplate.from_messages(
-        [("system", system_message)] + chat_history
-    )
-    chain = prompt | llm | output_parser
+    chat_history.append(HumanMessage(user_input))
+    turns.append({"role": "user", "content": user_input})
+    log_store.append_turn(session_id, "user", user_input)
+    route = router.route(CHAT, user_input)
 
     # Start thinking animation in background
     stop_thinking = False
     t = threading.Thread(target=show_thinking_animation)
     t.start()
 
-    # Call the model
-    response = chain.invoke({})
+    # Call the model (Ctrl-C stops this reply and its generation, not the chat)
+    generation = GenerationStream(route.llm, chat_prompt.invoke({"history": chat_history}))
+    generation.run(stop_on_interrupt=True)
+    router.observe(route, generation.elapsed)
+    response = generation.text
+    stats = ollama_stats(generation.metadata)
 
     # Stop animation
     stop_thinking = True
     t.join()
 
-    print(f": {response.strip()}\n")
-    chat_history.append(("assistant", response.strip()))
-    chat_log["chat_details"].append({"role":"assistant","content":response.strip()})
+    print(f": {response.strip()}{' [stopped]' if generation.cut_off else ''}\n")
+    chat_history.append(AIMessage(response.strip()))
+    turns.append({"role": "assistant", "content": response.strip()})
+    log_store.append_turn(session_id, "assistant", response.strip(), stats=stats)
     
 # --- FINAL SUMMARY USING THE MODEL ---
 formatted_chat = "\n".join(
-    [f"{msg['role'].capitalize()}: {msg['content']}" for msg in chat_log["chat_details"]]
+    [f"{msg['role'].capitalize()}: {msg['content']}" for msg in turns]
 )
 
 summary_prompt = ChatPromptTemplate.from_template(
     "Summarize this conversation into a single paragraph. Focus on what the user asked, what they were interested in, and what the assistant provided:\n\n{chat}"
 )
-summary_chain = summary_prompt | llm | output_parser
-summary_text = summary_chain.invoke({"chat": formatted_chat}).strip()
-
-chat_log["summary"] = summary_text
+summary_chain = summary_prompt | router.route(SUMMARY).llm
+summary_message = summary_chain.invoke({"chat": formatted_chat})
+summary_text = summary_message.content.strip()
+summary_stats = ollama_stats(summary_message.response_metadata)
 
 print("\n Generated Summary:\n")
 print(summary_text)
 
-#saving json file
-filename=f"chat_logs/{user_profile['username']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-os.makedirs("chat_logs",exist_ok=True)
+# --- Close the session in the log store ---
+log_store.end_session(session_id, summary=summary_text, summary_stats=summary_stats)
+log_store.close()
 
-with open(filename,"w",encoding="utf-8") as f:
-    json.dump(chat_log,f,ensure_ascii=False,indent=2)
-    
-print(f"\n the chat is saved to the {filename}")
+print(f"\n the chat is saved to the {log_store.directory}")
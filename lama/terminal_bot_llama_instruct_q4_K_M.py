@@ -1,34 +1,35 @@
 import sys
 import time
 import threading
-#for json
-import json
-from datetime import datetime
 import os
 
-from langchain_ollama import ChatOllama
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.messages import AIMessage, HumanMessage
 from mock_users import USER_PROFILES 
-#for memory summary
-from langchain.memory import ConversationSummaryBufferMemory
-from langchain_community.chat_message_histories import ChatMessageHistory
+
+# llm_client.py lives in the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_client import GenerationStream, get_llm, ollama_stats, warm_up_in_background
+from log_store import LogStore
 
 # --- model ---
-llm = ChatOllama(model="llama3.2:3b-instruct-q4_K_M", 
-                 #base_url="http://localhost:11434",
-                 temperature=0.7,
-                 top_k=40,
-                 top_p=0.9,
-                 repeat_penalty=1.1,
-                 num_ctx=4096
-                 )
-output_parser = StrOutputParser()
+llm = get_llm(
+    "llama3.2:3b-instruct-q4_K_M",
+    temperature=0.7,
+    top_k=40,
+    top_p=0.9,
+    repeat_penalty=1.1,
+    num_ctx=4096
+)
 
 
 
 #def chat(chat_history dict = none,user_input,  )
 
+# --- Optional: load the model while the user picks a profile (run with --warm-up) ---
+if "--warm-up" in sys.argv:
+    warm_up_in_background([llm.model])
+
 # --- Select user (simulate login) ---
 print("Available users:")
 for key, user in USER_PROFILES.items():
@@ -42,14 +43,12 @@ if selected_user not in USER_PROFILES:
 user_profile = USER_PROFILES[selected_user]
 chat_history = []
 
-#----------for json--------------
-chat_log={
-    "username":user_profile["username"],
-    "sport":user_profile["sport"],
-    "details":user_profile["details"],
-    "timestamp":datetime.now().isoformat(),
-    "chat_details":[]
-}
+# Turns so far, for the final summary
+turns = []
+
+# Each turn is appended to the log store as it happens, so Ctrl-C or a crash keeps the session
+log_store = LogStore()
+session_id = log_store.start_session(user_profile)
 
 
 # --- Personalized system message ---
@@ -85,6 +84,11 @@ def show_thinking_animation():
             time.sleep(0.4)
     sys.stdout.write("\r" + " " * 30 + "\r") 
 
+# --- Prompt, compiled once per session/profile; history goes in as message objects ---
+chat_prompt = ChatPromptTemplate.from_messages(
+    [("system", "{system_message}"), MessagesPlaceholder("history")]
+).partial(system_message=system_message)
+
 # --- Chat loop ---
 while True:
     user_input = input("You: ")
@@ -92,50 +96,48 @@ while True:
         print("Goodbye! 👋")
         break
 
-    chat_history.append(("user", user_input))
-    chat_log["chat_details"].append({"role":"user","content":user_input})
-    prompt = ChatPromptTemplate.from_messages(
-        [("system", system_message)] + chat_history
-    )
-    chain = prompt | llm | output_parser
+    chat_history.append(HumanMessage(user_input))
+    turns.append({"role": "user", "content": user_input})
+    log_store.append_turn(session_id, "user", user_input)
 
     # Start thinking animation in background
     stop_thinking = False
     t = threading.Thread(target=show_thinking_animation)
     t.start()
 
-    # Call the model
-    response = chain.invoke({})
+    # Call the model (Ctrl-C stops this reply and its generation, not the chat)
+    generation = GenerationStream(llm, chat_prompt.invoke({"history": chat_history}))
+    generation.run(stop_on_interrupt=True)
+    response = generation.text
+    stats = ollama_stats(generation.metadata)
 
     # Stop animation
     stop_thinking = True
     t.join()
 
-    print(f": {response.strip()}\n")
-    chat_history.append(("assistant", response.strip()))
-    chat_log["chat_details"].append({"role":"assistant","content":response.strip()})
+    print(f": {response.strip()}{' [stopped]' if generation.cut_off else ''}\n")
+    chat_history.append(AIMessage(response.strip()))
+    turns.append({"role": "assistant", "content": response.strip()})
+    log_store.append_turn(session_id, "assistant", response.strip(), stats=stats)
     
 # --- FINAL SUMMARY USING THE MODEL ---
 formatted_chat = "\n".join(
-    [f"{msg['role'].capitalize()}: {msg['content']}" for msg in chat_log["chat_details"]]
+    [f"{msg['role'].capitalize()}: {msg['content']}" for msg in turns]
 )
 
 summary_prompt = ChatPromptTemplate.from_template(
     "Summarize this conversation into a single paragraph. Focus on what the user asked, what they were interested in, and what the assistant provided:\n\n{chat}"
 )
-summary_chain = summary_prompt | llm | output_parser
-summary_text = summary_chain.invoke({"chat": formatted_chat}).strip()
-
-chat_log["summary"] = summary_text
+summary_chain = summary_prompt | llm
+summary_message = summary_chain.invoke({"chat": formatted_chat})
+summary_text = summary_message.content.strip()
+summary_stats = ollama_stats(summary_message.response_metadata)
 
 print("\nGenerated Summary:\n")
 print(summary_text)
 
-#saving json file
-filename=f"chat_logs/{user_profile['username']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-os.makedirs("chat_logs",exist_ok=True)
+# --- Close the session in the log store ---
+log_store.end_session(session_id, summary=summary_text, summary_stats=summary_stats)
+log_store.close()
 
-with open(filename,"w",encoding="utf-8") as f:
-    json.dump(chat_log,f,ensure_ascii=False,indent=2)
-    
-print(f"\n the chat is saved to the {filename}")
\ No newline at end of file
+print(f"\n the chat is saved to the {log_store.directory}")
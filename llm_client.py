@@ -0,0 +1,303 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+import httpx
+from ollama import AsyncClient, Client
+from langchain_ollama import ChatOllama, OllamaEmbeddings
+
+logger = logging.getLogger(__name__)
+
+# --- settings ---
+# One place for the Ollama host and how long a model stays loaded after its last call
+OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
+KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+# Ceiling on generated tokens for every call (0 = Ollama's default), so one runaway
+# reply cannot hold a slot that queued requests are waiting for
+NUM_PREDICT = int(os.environ.get("OLLAMA_NUM_PREDICT", "768"))
+# Longest single wait on Ollama, e.g. a long prompt eval before the first token
+READ_TIMEOUT = float(os.environ.get("OLLAMA_READ_TIMEOUT", "300"))
+
+OLLAMA_STAT_KEYS = (
+    "model", "prompt_eval_count", "eval_count",
+    "load_duration", "prompt_eval_duration", "eval_duration", "total_duration",
+    "done_reason",
+)
+
+# How a generation ended: Ollama's own done_reason ("stop", "length") or one of these
+DEADLINE = "deadline"
+CANCELLED = "cancelled"
+
+_lock = threading.Lock()
+_client = None
+_async_client = None
+_llms = {}  # (model, options) -> ChatOllama
+_embeddings = {}  # model -> OllamaEmbeddings
+# Set by GenerationStream.stream() around each read, for requests sent from this thread:
+#   .seconds     - timeout for the request instead of the client-wide READ_TIMEOUT
+#   .on_response - called with the streaming response once its headers arrive
+_call_options = threading.local()
+
+
+def _apply_call_timeout(request):
+    # httpx request hook: lets GenerationStream.stream() give one call a shorter timeout
+    # than the client-wide READ_TIMEOUT without a client of its own
+    seconds = getattr(_call_options, "seconds", None)
+    if seconds is not None:
+        request.extensions["timeout"] = httpx.Timeout(seconds).as_dict()
+
+
+def _watch_response(response):
+    # httpx response hook: hands the response to the GenerationStream that sent it
+    on_response = getattr(_call_options, "on_response", None)
+    if on_response is not None:
+        on_response(response)
+
+
+def get_client():
+    # Single ollama.Client, i.e. one pooled HTTP connection for every model in the process
+    global _client
+    with _lock:
+        if _client is None:
+            _client = Client(host=OLLAMA_BASE_URL, timeout=READ_TIMEOUT,
+                             event_hooks={"request": [_apply_call_timeout], "response": [_watch_response]})
+        return _client
+
+
+def get_async_client():
+    # Async twin of get_client() for ainvoke/astream; belongs to the ASGI server's loop
+    global _async_client
+    with _lock:
+        if _async_client is None:
+            _async_client = AsyncClient(host=OLLAMA_BASE_URL, timeout=READ_TIMEOUT)
+        return _async_client
+
+
+def get_llm(model, **options):
+    # Shared ChatOllama per (model, options); all of them talk through get_client()
+    # (and get_async_client() for ainvoke/astream)
+    if NUM_PREDICT:
+        options.setdefault("num_predict", NUM_PREDICT)
+    key = (model, tuple(sorted(options.items())))
+    client = get_client()
+    async_client = get_async_client()
+    with _lock:
+        if key not in _llms:
+            llm = ChatOllama(model=model, base_url=OLLAMA_BASE_URL, keep_alive=KEEP_ALIVE, **options)
+            llm._client = client
+            llm._async_client = async_client
+            _llms[key] = llm
+        return _llms[key]
+
+
+def get_embeddings(model):
+    # Shared OllamaEmbeddings per model, on the same pooled clients as get_llm()
+    client = get_client()
+    async_client = get_async_client()
+    with _lock:
+        if model not in _embeddings:
+            embeddings = OllamaEmbeddings(model=model, base_url=OLLAMA_BASE_URL)
+            embeddings._client = client
+            embeddings._async_client = async_client
+            _embeddings[model] = embeddings
+        return _embeddings[model]
+
+
+def ollama_stats(metadata):
+    # Token counts and timings (ns) Ollama returns with every generation
+    return {key: metadata.get(key) for key in OLLAMA_STAT_KEYS}
+
+
+class GenerationStream:
+    # One streamed generation that can be cut short. stream()/astream() yield text
+    # chunks until Ollama is done or `deadline` (a time.monotonic() value) passes; closing
+    # the generator (client went away, Ctrl-C) ends it too. Either way the HTTP response
+    # is closed, and Ollama stops generating once its client disconnects, so the model
+    # goes back to queued requests instead of finishing a reply nobody reads.
+    # Afterwards text/metadata/done_reason describe the reply, partial or not.
+
+    def __init__(self, llm, prompt, deadline=None):
+        self.llm = llm
+        self.prompt = prompt
+        self.deadline = deadline
+        self.chunks = []
+        self.metadata = {}
+        self.done_reason = None
+        self.first_token_seconds = None
+        self.started = time.monotonic()
+        self._timed_out = False  # the deadline ended the request (timeout or timer)
+        self._timer = None
+
+    @property
+    def text(self):
+        return "".join(self.chunks).strip()
+
+    @property
+    def cut_off(self):
+        return self.done_reason in (DEADLINE, CANCELLED)
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def remaining(self):
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def _expired(self):
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def _add(self, chunk):
+        if chunk.content:
+            if not self.chunks:
+                self.first_token_seconds = self.elapsed
+            self.chunks.append(chunk.content)
+        self.metadata = chunk.response_metadata or self.metadata
+
+    def _finish(self):
+        if self.metadata.get("done"):
+            self.done_reason = self.metadata.get("done_reason") or "stop"
+            return
+        # Cut off: Ollama never sent its final counters, so count what arrived
+        # (one token per chunk) and the wall time spent
+        self.done_reason = DEADLINE if self._timed_out or self._expired() else CANCELLED
+        self.metadata = dict(
+            self.metadata,
+            model=self.llm.model,
+            eval_count=len(self.chunks),
+            total_duration=int(self.elapsed * 1e9),
+            done_reason=self.done_reason,
+        )
+
+    def _expire_at_deadline(self, response):
+        # Once the response starts streaming, a timer shuts its socket down when the
+        # deadline passes. That also ends a read blocked on the next chunk, which a
+        # check between chunks cannot.
+        network_stream = response.extensions.get("network_stream")
+        sock = network_stream.get_extra_info("socket") if network_stream is not None else None
+        if sock is None:
+            return
+
+        def expire():
+            if response.is_closed:
+                return
+            self._timed_out = True
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+        self._timer = threading.Timer(max(0.0, self.remaining()), expire)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def stream(self):
+        # Until the response starts, the request's timeout is what is left of the deadline
+        # (prompt eval, a busy server); after that a timer cuts the connection at the
+        # deadline, so a stall between chunks ends then too, not after READ_TIMEOUT.
+        chunks = self.llm.stream(self.prompt)
+        try:
+            while not self._expired():
+                remaining = self.remaining()
+                if remaining is not None:
+                    _call_options.seconds = min(READ_TIMEOUT, remaining)
+                    _call_options.on_response = self._expire_at_deadline if self._timer is None else None
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    break
+                except httpx.TransportError as e:
+                    # The deadline-bound timeout fired before the response, or the timer cut it
+                    timed_out = isinstance(e, httpx.TimeoutException) and remaining is not None \
+                        and remaining < READ_TIMEOUT
+                    if not (self._timed_out or timed_out):
+                        raise
+                    self._timed_out = True
+                    break
+                finally:
+                    _call_options.seconds = None
+                    _call_options.on_response = None
+                self._add(chunk)
+                if chunk.content:
+                    yield chunk.content
+        finally:
+            if self._timer is not None:
+                self._timer.cancel()
+            chunks.close()
+            self._finish()
+
+    async def astream(self):
+        # Here the deadline also interrupts a wait for the next chunk
+        chunks = self.llm.astream(self.prompt)
+        try:
+            while not self._expired():
+                try:
+                    chunk = await asyncio.wait_for(anext(chunks), self.remaining())
+                except (StopAsyncIteration, asyncio.TimeoutError):
+                    break
+                self._add(chunk)
+                if chunk.content:
+                    yield chunk.content
+        finally:
+            await chunks.aclose()
+            self._finish()
+
+    def run(self, stop_on_interrupt=False):
+        # stop_on_interrupt: Ctrl-C ends this generation ("cancelled", partial text kept)
+        # instead of the program; used by the terminal bots
+        try:
+            for _ in self.stream():
+                pass
+        except KeyboardInterrupt:
+            if not stop_on_interrupt:
+                raise
+        return self
+
+    async def arun(self):
+        async for _ in self.astream():
+            pass
+        return self
+
+
+def warm_up(models):
+    # An empty generate call loads the model without producing tokens
+    for model in models:
+        try:
+            get_client().generate(model=model, prompt="", keep_alive=KEEP_ALIVE)
+            logger.info("Warmed up %s", model)
+        except Exception:
+            logger.warning("Warm-up failed for %s", model, exc_info=True)
+
+
+def warm_up_in_background(models):
+    thread = threading.Thread(target=warm_up, args=(list(models),), daemon=True)
+    thread.start()
+    return thread
+
+
+def health(model=None):
+    # {"ok": server reachable, "resident": model loaded in memory, "models": loaded models}
+    try:
+        loaded = [m.model for m in get_client().ps().models]
+    except Exception as e:
+        return {"ok": False, "resident": False, "models": [], "error": str(e)}
+    resident = model in loaded if model else bool(loaded)
+    return {"ok": True, "resident": resident, "models": loaded}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preload Ollama models or check which are resident.")
+    parser.add_argument("--warm-up", nargs="+", metavar="MODEL", help="load these models and keep them resident")
+    parser.add_argument("--health", nargs="?", const="", metavar="MODEL", help="print the health probe result")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.warm_up:
+        warm_up(args.warm_up)
+    if args.health is not None:
+        print(json.dumps(health(args.health or None), indent=2))
@@ -0,0 +1,207 @@
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from chat.ai_logic import get_bot_user_id, router, summary_prompt, update_topic_summary
+from chat.ai_models import GenerationStats
+from chat.generation_stats import record_generation
+from chat.model_router import SUMMARY as SUMMARY_CALL
+from chat.models import Chat
+from chat.scheduler import BATCH, Overloaded, get_scheduler
+
+# lama/ is not a package; its log_store is imported the way the terminal bots do
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "lama"))
+from log_store import LogStore, iter_sessions  # noqa: E402
+
+User = get_user_model()
+
+MAX_ATTEMPTS = 5
+# A chat_logs session is summarized in one call, so keep its text inside the context window
+MAX_LOG_CHARS = 12000
+
+
+def _write_json_atomic(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _with_retries(fn, *args):
+    # Overloaded means the scheduler queue is full (live traffic); wait as told, then retry
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            return fn(*args)
+        except Overloaded as e:
+            if attempt + 1 == MAX_ATTEMPTS:
+                raise
+            time.sleep(e.retry_after)
+
+
+class Progress:
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.started = time.monotonic()
+
+    def advance(self, count):
+        self.done += count
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        eta = (self.total - self.done) / rate if rate else 0.0
+        return f"{self.done}/{self.total} ({rate * 60:.1f}/min, ETA {eta / 60:.1f} min)"
+
+
+class Command(BaseCommand):
+    help = (
+        "Regenerate Chat.topic_summary for every chat, e.g. after the summary prompt or model "
+        "changed. Chats are walked by id in batches and summarized in parallel; progress is "
+        "checkpointed after each batch, so a rerun resumes where the last one stopped. "
+        "With --chat-logs, fills in missing summaries of recorded chat_logs sessions instead."
+    )
+
+    def add_arguments(self, parser):
+        # BATCH priority only orders calls inside this process; the web workers' live
+        # turns compete with every one of these for the Ollama server's slots
+        parser.add_argument("--workers", type=int, default=1,
+                            help="parallel model calls; keep it at or below the Ollama server's "
+                                 "OLLAMA_NUM_PARALLEL minus the slots live traffic needs")
+        parser.add_argument("--batch-size", type=int, default=50, help="chats per batch/checkpoint")
+        parser.add_argument("--checkpoint", default="topic_summary_backfill.json", help="checkpoint file")
+        parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start over")
+        parser.add_argument("--chat-logs", nargs="+", metavar="DIR",
+                            help="chat_logs directories to fill in missing session summaries for")
+
+    def handle(self, *args, **options):
+        if options["chat_logs"]:
+            self.backfill_chat_logs(options["chat_logs"], options["workers"])
+        else:
+            self.backfill_chats(options)
+
+    # --- Chat.topic_summary ---
+
+    def backfill_chats(self, options):
+        path = options["checkpoint"]
+        state = {"last_id": 0, "done": 0, "skipped": 0, "failed": []}
+        if not options["restart"] and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+            self.stdout.write(f"Resuming after chat {state['last_id']} ({state['done']} done)")
+
+        progress = Progress(Chat.objects.filter(id__gt=state["last_id"]).count())
+        bot_user_id = get_bot_user_id()
+        with ThreadPoolExecutor(max_workers=options["workers"], thread_name_prefix="summary-backfill") as pool:
+            while True:
+                # Keyset pagination: stable and index-only however far along the walk is
+                ids = list(
+                    Chat.objects.filter(id__gt=state["last_id"]).order_by("id")
+                    .values_list("id", flat=True)[:options["batch_size"]]
+                )
+                if not ids:
+                    break
+                for chat_id, result in zip(ids, pool.map(self._summarize_chat, ids, [bot_user_id] * len(ids))):
+                    if result == "failed":
+                        state["failed"].append(chat_id)
+                    else:
+                        state[result] += 1
+                state["last_id"] = ids[-1]
+                _write_json_atomic(path, state)
+                self.stdout.write(progress.advance(len(ids)))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{state['done']} summaries rebuilt, {state['skipped']} chats without a user, "
+            f"{len(state['failed'])} failed (ids in {path})"
+        ))
+
+    def _summarize_chat(self, chat_id, bot_user_id):
+        close_old_connections()
+        try:
+            chat = Chat.objects.get(id=chat_id)
+            user = chat.participants.exclude(id=bot_user_id).first()
+            if user is None:
+                return "skipped"
+            _with_retries(update_topic_summary, chat, user, True, BATCH)
+            return "done"
+        except Exception as e:
+            self.stderr.write(f"Chat {chat_id}: {e}")
+            return "failed"
+        finally:
+            close_old_connections()
+
+    # --- chat_logs sessions ---
+
+    def backfill_chat_logs(self, directories, workers):
+        jobs = []  # (session, write_back)
+        for directory in directories:
+            for name in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+                if name.endswith(".json"):
+                    path = os.path.join(directory, name)
+                    session, text = self._load_session_file(path)
+                    if not session.get("summary"):
+                        jobs.append((session, lambda s, summary, p=path, t=text: self._save_session_file(p, t, summary)))
+            store_dir = os.path.join(directory, "store")
+            if os.path.isdir(store_dir):
+                store = LogStore(store_dir)
+                for session in iter_sessions(store_dir):
+                    if not session.get("summary"):
+                        jobs.append((session, lambda s, summary, st=store: st.set_summary(s["session"], summary)))
+
+        progress = Progress(len(jobs))
+        failed = 0
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="summary-backfill") as pool:
+            summaries = pool.map(self._summarize_session, [session for session, _ in jobs])
+            # Written back from this thread only, in order, as each result comes in
+            for (session, write_back), summary in zip(jobs, summaries):
+                if summary:
+                    write_back(session, summary)
+                else:
+                    failed += 1
+                self.stdout.write(progress.advance(1))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(jobs) - failed} session summaries written, {failed} failed"
+        ))
+
+    def _summarize_session(self, session):
+        chat = "\n".join(
+            f"{turn['role'].capitalize()}: {turn['content']}"
+            for turn in session.get("chat_details", []) if turn.get("content")
+        )[-MAX_LOG_CHARS:]
+        if not chat:
+            return None
+        try:
+            return _with_retries(self._summarize_text, chat)
+        except Exception as e:
+            self.stderr.write(f"Session {session.get('session') or session.get('timestamp')}: {e}")
+            return None
+
+    def _summarize_text(self, chat):
+        route = router.route(SUMMARY_CALL)
+        with get_scheduler(route.model).slot(BATCH):
+            message = (summary_prompt | route.llm).invoke({"chat": chat})
+        record_generation(message.response_metadata, GenerationStats.KIND_SUMMARY, route.model)
+        return message.content.strip()
+
+    @staticmethod
+    def _load_session_file(path):
+        # Same parsing as log_store.load_session_file, but keeps the hand-written notes
+        # that follow the JSON object so they survive the rewrite
+        with open(path, encoding="utf-8") as f:
+            text = f.read().lstrip()
+        session, end = json.JSONDecoder().raw_decode(text)
+        return session, text[end:]
+
+    @staticmethod
+    def _save_session_file(path, trailing, summary):
+        session, _ = Command._load_session_file(path)
+        session["summary"] = summary
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps(session, indent=2) + trailing)
+        os.replace(tmp, path)
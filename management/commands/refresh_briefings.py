@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from chat.briefings import TTL_SECONDS, refresh_all
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the shared team/player briefings for every About profile. Only missing or "
+        "expired briefings are regenerated, so it is cheap to run from cron more often than the TTL. "
+        "Model calls are made one at a time. Their BATCH priority only orders them within this "
+        "process; the web workers' live turns do not wait ahead of them, so the run takes one "
+        "of the Ollama server's parallel slots while it lasts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="regenerate briefings that are still fresh")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        counts = refresh_all(force=options["force"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{counts['entities']} followed entities: {counts['generated']} generated, "
+            f"{counts['fresh']} still fresh, {counts['failed']} failed "
+            f"in {time.monotonic() - started:.1f}s (TTL {TTL_SECONDS}s)"
+        ))
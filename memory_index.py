@@ -0,0 +1,286 @@
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, one writer process only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Rough chars-per-token ratio when no tokenizer is passed in
+CHARS_PER_TOKEN = 4
+DTYPE = np.float32  # float32 keeps search a single BLAS mat-vec over the mapped file
+# Rewritten keys leave dead rows behind; an owner's files are compacted once dead rows
+# outnumber live ones and there are at least this many
+COMPACT_MIN_DEAD_ROWS = 256
+
+
+def _estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class _OwnerStore:
+    # One owner's memory, append-only:
+    #   <owner>.vec   - unit-normalized float32 vectors, one row per snippet (np.memmap)
+    #   <owner>.jsonl - one JSON line per snippet: {"row", "text", "key", ...metadata},
+    #                   where "row" is the snippet's row in .vec
+    #   <owner>.dim   - vector width, written with the first row
+    #   <owner>.lock  - flock taken exclusive by writers and shared by readers, so
+    #                   gunicorn workers and management commands can share the files
+    # Rows sharing a key (e.g. a chat's topic summary, rewritten over time) count once,
+    # the newest row wins; the older ones are dropped when the files are compacted.
+
+    def __init__(self, directory, owner):
+        name = re.sub(r"[^\w.-]", "_", str(owner))
+        self.vec_path = os.path.join(directory, f"{name}.vec")
+        self.meta_path = os.path.join(directory, f"{name}.jsonl")
+        self.dim_path = os.path.join(directory, f"{name}.dim")
+        self.lock_path = os.path.join(directory, f"{name}.lock")
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._files = None
+        self._offset = 0  # bytes of the .jsonl already parsed into _items
+        self._dim = None
+        self._vectors = None
+        self._items = []
+        self._indexed = 0  # _items[:_indexed] are in _by_row/_live
+        self._by_row = {}  # vector row -> item
+        self._latest = {}  # key -> row of its newest item
+        self._live = np.zeros(0, dtype=bool)
+
+    @contextmanager
+    def _flock(self, exclusive):
+        with open(self.lock_path, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield  # closing the file releases the lock
+
+    def _file_state(self):
+        # (inode, size) of .vec and .jsonl; compaction replaces them with new inodes
+        state = []
+        for path in (self.vec_path, self.meta_path):
+            try:
+                stat = os.stat(path)
+                state.append((stat.st_ino, stat.st_size))
+            except FileNotFoundError:
+                state.append((0, 0))
+        return tuple(state)
+
+    def _read_new_items(self):
+        # Parses only the complete lines appended since the last read
+        if not os.path.exists(self.meta_path):
+            return
+        with open(self.meta_path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        self._items.extend(json.loads(line) for line in data[:end].splitlines() if line.strip())
+        self._offset += end
+
+    def _refresh(self):
+        # Caller holds _flock. Remaps only when the files changed, and parses only the
+        # lines appended since the last call.
+        files = self._file_state()
+        if files == self._files:
+            return
+        if self._files and any(new[0] != old[0] or new[1] < old[1] for new, old in zip(files, self._files)):
+            self._reset()  # compacted or truncated, not appended to
+        self._read_new_items()
+        rows = 0
+        if files[0][1] and self._items:
+            if self._dim is None:
+                with open(self.dim_path, encoding="utf-8") as f:
+                    self._dim = int(f.read())
+            rows = files[0][1] // (self._dim * np.dtype(DTYPE).itemsize)
+        if rows:
+            self._vectors = np.memmap(self.vec_path, dtype=DTYPE, mode="r", shape=(rows, self._dim))
+        else:
+            self._vectors = None
+        # Index the new items by their row; a repeated key retires its older row.
+        # Lines written before rows were recorded use their position.
+        live = np.zeros(rows, dtype=bool)
+        live[:len(self._live)] = self._live
+        while self._indexed < len(self._items):
+            item = self._items[self._indexed]
+            row = item.get("row", self._indexed)
+            if row >= rows:
+                break
+            key = item.get("key", row)
+            if key in self._latest:
+                live[self._latest[key]] = False
+            self._latest[key] = row
+            self._by_row[row] = item
+            live[row] = True
+            self._indexed += 1
+        self._live = live
+        self._files = files
+
+    def append(self, vectors, items):
+        vectors = np.ascontiguousarray(vectors, dtype=DTYPE)
+        with self.lock, self._flock(exclusive=True):
+            self._refresh()
+            if not os.path.exists(self.dim_path):
+                with open(self.dim_path, "w", encoding="utf-8") as f:
+                    f.write(str(vectors.shape[1]))
+            # Line i describes row i. Cut what a crashed writer left behind (vector rows
+            # without a line, a half-written last line) so the new rows line up again.
+            first_row = len(self._items)
+            with open(self.vec_path, "ab") as f:
+                f.truncate(first_row * vectors.shape[1] * vectors.itemsize)
+                f.write(vectors.tobytes())
+            with open(self.meta_path, "ab") as f:
+                f.truncate(self._offset)
+                f.write("".join(
+                    json.dumps(dict(item, row=first_row + i), ensure_ascii=False) + "\n"
+                    for i, item in enumerate(items)
+                ).encode("utf-8"))
+            self._refresh()
+            live = int(self._live.sum())
+            if len(self._live) - live >= max(COMPACT_MIN_DEAD_ROWS, live):
+                self._compact()
+
+    def _compact(self):
+        # Caller holds the exclusive _flock. Rewrites both files with only the live rows,
+        # renumbered; readers refresh under the shared lock, so they never see one file
+        # replaced and not the other.
+        keep = np.flatnonzero(self._live)
+        with open(f"{self.vec_path}.tmp", "wb") as f:
+            f.write(np.ascontiguousarray(self._vectors[keep]).tobytes())
+        with open(f"{self.meta_path}.tmp", "w", encoding="utf-8") as f:
+            for new_row, row in enumerate(keep):
+                f.write(json.dumps(dict(self._by_row[row], row=new_row), ensure_ascii=False) + "\n")
+        os.replace(f"{self.vec_path}.tmp", self.vec_path)
+        os.replace(f"{self.meta_path}.tmp", self.meta_path)
+        logger.info("Compacted %s: %d rows -> %d", self.meta_path, len(self._live), len(keep))
+        self._reset()
+
+    def search(self, vector, k, exclude=None):
+        with self.lock:
+            with self._flock(exclusive=False):
+                self._refresh()
+            # The mapping stays valid after the lock is released, even if the file is replaced
+            if self._vectors is None:
+                return []
+            scores = np.asarray(self._vectors @ vector)
+            scores[~self._live] = -np.inf
+            candidates = min(len(scores), k * 4)
+            top = np.argpartition(-scores, candidates - 1)[:candidates]
+            results = []
+            for i in top[np.argsort(-scores[top])]:
+                if not np.isfinite(scores[i]):
+                    continue
+                item = {key: value for key, value in self._by_row[i].items() if key != "row"}
+                if exclude and exclude(item):
+                    continue
+                results.append(dict(item, score=float(scores[i])))
+                if len(results) == k:
+                    break
+            return results
+
+
+class MemoryIndex:
+    # Per-owner long-term memory: past turns and summaries are embedded once, then the
+    # top-k snippets most similar to the new message are retrieved within a token
+    # budget. Search is one mat-vec over a memory-mapped file, so it stays in the
+    # low milliseconds for thousands of snippets per owner.
+
+    def __init__(self, directory, embeddings, min_score=0.35):
+        self.directory = directory
+        self.embeddings = embeddings
+        self.min_score = min_score
+        self._stores = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _store(self, owner):
+        with self._lock:
+            store = self._stores.get(owner)
+            if store is None:
+                store = self._stores[owner] = _OwnerStore(self.directory, owner)
+            return store
+
+    def add(self, owner, items):
+        # items: [{"text": ..., "key": ..., any other JSON metadata}, ...]
+        items = [item for item in items if item.get("text")]
+        if not items:
+            return
+        vectors = np.asarray(self.embeddings.embed_documents([item["text"] for item in items]), dtype=DTYPE)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        self._store(owner).append(vectors / np.where(norms == 0, 1, norms), items)
+
+    def embed_query(self, text):
+        vector = np.asarray(self.embeddings.embed_query(text), dtype=DTYPE)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def search(self, owner, vector, k=8, budget_tokens=512, exclude=None, count_tokens=None):
+        # Best-first snippets scoring >= min_score whose texts fit in budget_tokens
+        count_tokens = count_tokens or _estimate_tokens
+        results = []
+        for item in self._store(owner).search(np.asarray(vector, dtype=DTYPE), k, exclude):
+            if item["score"] < self.min_score:
+                break
+            tokens = count_tokens(item["text"])
+            if tokens > budget_tokens:
+                continue
+            budget_tokens -= tokens
+            results.append(item)
+        return results
+
+
+def session_items(session, max_chars=600):
+    # Snippets for one recorded chat_logs session: each user turn with its reply, plus
+    # the session summary
+    items = []
+    turns = session.get("chat_details", [])
+    started = session.get("timestamp", "")
+    for i, turn in enumerate(turns):
+        if turn.get("role") != "user":
+            continue
+        reply = turns[i + 1]["content"] if i + 1 < len(turns) and turns[i + 1].get("role") == "assistant" else ""
+        text = f"Coach: {turn['content']}\nAssistant: {reply}"[:max_chars]
+        items.append({"text": text, "key": f"log:{started}:{i}", "kind": "turn", "source": "chat_logs"})
+    if session.get("summary"):
+        items.append({"text": session["summary"], "key": f"log:{started}:summary",
+                      "kind": "summary", "source": "chat_logs"})
+    return items
+
+
+if __name__ == "__main__":
+    # Index recorded terminal-bot sessions so their content carries over into web chats
+    # (owners are usernames, same as chat.ai_logic uses)
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "lama"))
+    from llm_client import get_embeddings
+    from log_store import iter_sessions, load_session_file
+
+    parser = argparse.ArgumentParser(description="Add chat_logs sessions to the per-user memory index.")
+    parser.add_argument("--logs", nargs="+", default=["chat_logs", "lama/chat_logs"], help="chat_logs directories")
+    parser.add_argument("--directory", default="chat_memory", help="memory index directory")
+    parser.add_argument("--model", default="nomic-embed-text", help="Ollama embedding model")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    index = MemoryIndex(args.directory, get_embeddings(args.model))
+    count = 0
+    for directory in args.logs:
+        sessions = [load_session_file(p) for p in sorted(
+            os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".json")
+        )] if os.path.isdir(directory) else []
+        sessions.extend(iter_sessions(os.path.join(directory, "store")))
+        for session in sessions:
+            items = session_items(session)
+            if session.get("username") and items:
+                index.add(session["username"], items)
+                count += len(items)
+    logger.info("Indexed %d snippets into %s", count, args.directory)
@@ -0,0 +1,133 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    from opentelemetry import trace
+    _tracer = trace.get_tracer("chat.ai_logic")
+except ImportError:  # spans are optional, histograms always work
+    _tracer = None
+
+# Seconds; covers fast DB steps up to long CPU generations
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class Histogram:
+    # Minimal Prometheus-style histogram with one label, safe to share across threads
+
+    def __init__(self, name, documentation, label, buckets=BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}  # label value -> [bucket counts..., count, sum]
+
+    def observe(self, label_value, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):  # above the last bound only counts toward +Inf
+                series[index] += 1
+            series[-2] += 1
+            series[-1] += seconds
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for value, counts in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{self.label}="{value}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{self.label}="{value}",le="+Inf"}} {counts[-2]}')
+            lines.append(f'{self.name}_count{{{self.label}="{value}"}} {counts[-2]}')
+            lines.append(f'{self.name}_sum{{{self.label}="{value}"}} {counts[-1]:.6f}')
+        return "\n".join(lines)
+
+
+class Counter:
+    # Minimal Prometheus-style counter with one label, safe to share across threads
+
+    def __init__(self, name, documentation, label):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, label_value, amount=1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for value, count in sorted(values.items()):
+            lines.append(f'{self.name}{{{self.label}="{value}"}} {count}')
+        return "\n".join(lines)
+
+
+STAGE_SECONDS = Histogram(
+    "chat_stage_seconds", "Time spent in each step of a chat turn.", "stage"
+)
+GENERATIONS = Counter(
+    "chat_generations_total", "Chat reply generations by how they ended.", "done_reason"
+)
+GENERATED_TOKENS = Counter(
+    "chat_generated_tokens_total", "Tokens generated for chat replies, by how they ended.", "done_reason"
+)
+
+
+def render_prometheus():
+    return "\n".join([STAGE_SECONDS.render(), GENERATIONS.render(), GENERATED_TOKENS.render()]) + "\n"
+
+
+class Timings:
+    # Per-request stage timer. Every stage also feeds STAGE_SECONDS and, when
+    # OpenTelemetry is installed, becomes a span under the current trace.
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        span = _tracer.start_as_current_span(f"chat.{name}") if _tracer else None
+        if span is not None:
+            span.__enter__()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+            if span is not None:
+                span.__exit__(None, None, None)
+
+    def record(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+        STAGE_SECONDS.observe(name, seconds)
+
+    def record_llm(self, metadata):
+        # Ollama reports load / prompt-eval / generation time in nanoseconds
+        for name, key in (("llm_load", "load_duration"),
+                          ("llm_prompt_eval", "prompt_eval_duration"),
+                          ("llm_generation", "eval_duration")):
+            if metadata.get(key):
+                self.record(name, metadata[key] / 1e9)
+
+    def record_generation(self, generation):
+        # A chat.llm_client.GenerationStream, finished or cut off (deadline/cancelled)
+        self.record("llm", generation.elapsed)
+        if generation.first_token_seconds is not None:
+            self.record("llm_first_token", generation.first_token_seconds)
+        self.record_llm(generation.metadata)
+        GENERATIONS.inc(generation.done_reason)
+        GENERATED_TOKENS.inc(generation.done_reason, generation.metadata.get("eval_count") or 0)
+
+    def as_dict(self):
+        return {name: round(seconds * 1000, 2) for name, seconds in self.stages.items()}
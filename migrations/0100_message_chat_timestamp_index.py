@@ -0,0 +1,37 @@
+import os
+import re
+
+from django.db import migrations, models
+
+# The chat history queries (chat.context_builder) filter on chat and order by timestamp.
+# Message lives in chat/models.py, so its Meta must list the same index for the model
+# state to match:
+#     indexes = [models.Index(fields=["chat", "timestamp"], name="chat_message_chat_ts_idx")]
+# Installs that ran the old post_migrate hook already have the index, hence IF NOT EXISTS.
+
+
+def previous_migration():
+    # The other chat migrations are generated per install (see chat.ai_models), so this
+    # one follows whichever of them sorts right before it
+    directory, filename = os.path.split(__file__)
+    this = os.path.splitext(filename)[0]
+    names = [os.path.splitext(name)[0] for name in os.listdir(directory) if re.fullmatch(r"\d{4}_\w+\.py", name)]
+    return max(name for name in names if name < this)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("chat", previous_migration())]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS chat_message_chat_ts_idx ON chat_message (chat_id, "timestamp")',
+            reverse_sql="DROP INDEX IF EXISTS chat_message_chat_ts_idx",
+            state_operations=[
+                migrations.AddIndex(
+                    model_name="message",
+                    index=models.Index(fields=["chat", "timestamp"], name="chat_message_chat_ts_idx"),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,118 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque, namedtuple
+
+try:
+    from chat.llm_client import get_llm, health, warm_up_in_background
+except ImportError:  # terminal bots put the repo root on sys.path instead
+    from llm_client import get_llm, health, warm_up_in_background
+
+logger = logging.getLogger(__name__)
+
+# --- tiers ---
+SMALL_MODEL = os.environ.get("LLM_SMALL_MODEL", "llama3.2:3b-instruct-q4_K_M")
+LARGE_MODEL = os.environ.get("LLM_LARGE_MODEL", "mistral:7b-instruct-q4_K_M")
+# p95 of the large model's recent calls must stay under this, or it is skipped for COOLDOWN
+LARGE_SLO_SECONDS = float(os.environ.get("LLM_LARGE_SLO_SECONDS", "20"))
+COOLDOWN_SECONDS = float(os.environ.get("LLM_LARGE_COOLDOWN_SECONDS", "120"))
+SLO_WINDOW = 20
+RESIDENT_TTL_SECONDS = 10
+
+# --- call types ---
+CHAT = "chat"
+SUMMARY = "summary"
+
+# --- complexity of a chat turn ---
+FOLLOW_UP = "follow_up"
+ANALYSIS = "analysis"
+FOLLOW_UP_MAX_WORDS = 8
+ANALYSIS_WORDS = (
+    "analy", "compare", "breakdown", "break down", "strateg", "tactic", "scout", "stats",
+    "statistic", "performance", "season", "game plan", "matchup", "lineup", "rotation",
+    "explain", "why", "improve", "develop",
+)
+
+Route = namedtuple("Route", "kind complexity model llm reason")
+
+
+def classify(text):
+    # Cheap heuristic: short turns without analysis words are follow-ups
+    lowered = (text or "").lower()
+    if len(lowered.split()) <= FOLLOW_UP_MAX_WORDS and not any(w in lowered for w in ANALYSIS_WORDS):
+        return FOLLOW_UP
+    return ANALYSIS
+
+
+class ModelRouter:
+    # Picks a model per call: summaries and follow-ups go to the small model, analysis
+    # to the large one unless it is not loaded or its recent p95 is over the SLO.
+    # Every decision is logged and counted (see render_prometheus()).
+
+    def __init__(self, small=SMALL_MODEL, large=LARGE_MODEL, slo_seconds=LARGE_SLO_SECONDS,
+                 cooldown_seconds=COOLDOWN_SECONDS, window=SLO_WINDOW, **options):
+        self.small = small
+        self.large = large
+        self.slo_seconds = slo_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.options = options
+        self._lock = threading.Lock()
+        self._samples = {small: deque(maxlen=window), large: deque(maxlen=window)}
+        self._degraded_until = 0.0
+        self._resident = (0.0, False)  # (checked at, resident)
+        self._warming_until = 0.0
+        self.decisions = Counter()  # (kind, complexity, model, reason) -> count
+
+    def llm(self, model):
+        return get_llm(model, **self.options)
+
+    def route(self, kind, text=""):
+        complexity = classify(text) if kind == CHAT else None
+        if kind != CHAT or complexity == FOLLOW_UP or self.large == self.small:
+            model, reason = self.small, kind if kind != CHAT else complexity
+        else:
+            model, reason = self.large, "analysis"
+            if time.monotonic() < self._degraded_until:
+                model, reason = self.small, "large_over_slo"
+            elif not self._large_resident():
+                model, reason = self.small, "large_not_loaded"
+
+        with self._lock:
+            self.decisions[(kind, complexity or "-", model, reason)] += 1
+        logger.info("Routed %s (%s) to %s: %s", kind, complexity or "-", model, reason)
+        return Route(kind, complexity, model, self.llm(model), reason)
+
+    def observe(self, route, seconds):
+        # Feed back the call's wall time; the large model's p95 drives the fallback
+        with self._lock:
+            samples = self._samples[route.model]
+            samples.append(seconds)
+            if route.model != self.large or len(samples) < 5:
+                return
+            p95 = sorted(samples)[int(0.95 * (len(samples) - 1))]
+            if p95 > self.slo_seconds:
+                self._degraded_until = time.monotonic() + self.cooldown_seconds
+                samples.clear()
+                logger.warning("%s p95 %.1fs is over its %.1fs SLO; using %s for %ds",
+                               self.large, p95, self.slo_seconds, self.small, self.cooldown_seconds)
+
+    def _large_resident(self):
+        checked_at, resident = self._resident
+        now = time.monotonic()
+        if now - checked_at > RESIDENT_TTL_SECONDS:
+            resident = health(self.large)["resident"]
+            self._resident = (now, resident)
+            if not resident and now >= self._warming_until:
+                # Load it in the background so later analysis turns can use it
+                self._warming_until = now + self.cooldown_seconds
+                warm_up_in_background([self.large])
+        return resident
+
+    def render_prometheus(self):
+        lines = ["# HELP llm_route_total Model routing decisions.", "# TYPE llm_route_total counter"]
+        with self._lock:
+            for (kind, complexity, model, reason), count in sorted(self.decisions.items()):
+                lines.append(f'llm_route_total{{kind="{kind}",complexity="{complexity}",'
+                             f'model="{model}",reason="{reason}"}} {count}')
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,68 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from about.models import About
+from chat.ai_models import GenerationStats, ProfileDigest
+from chat.generation_stats import record_generation
+from chat.profile_prompt import digest_prompt, profile_key
+from chat.scheduler import SUMMARY, get_scheduler
+from chat.summary_worker import run_in_background
+
+_digests = {}  # key -> digest, per-process copy of the table
+_pending = set()  # keys with a refresh queued or running in this process
+_pending_lock = threading.Lock()
+
+
+def _llm():
+    from chat.ai_logic import llm
+    return llm
+
+
+def get_profile_digest(about):
+    # O(1) lookup for the chat path; None until the digest has been generated
+    key = profile_key(about.sport_coach, about.details, _llm().model)
+    if key not in _digests:
+        digest = ProfileDigest.objects.filter(key=key).values_list("digest", flat=True).first()
+        if digest is None:
+            return None
+        _digests[key] = digest
+    return _digests[key]
+
+
+def refresh_profile_digest(about_id):
+    about = About.objects.get(id=about_id)
+    llm = _llm()
+    key = profile_key(about.sport_coach, about.details, llm.model)
+    if ProfileDigest.objects.filter(key=key).exists():
+        return
+    chain = digest_prompt | llm
+    with get_scheduler(llm.model).slot(SUMMARY):
+        message = chain.invoke({"details": about.details})
+    ProfileDigest.objects.get_or_create(key=key, defaults={"digest": message.content.strip()})
+    record_generation(message.response_metadata, GenerationStats.KIND_PROFILE_DIGEST, llm.model, user=about.user)
+
+
+def schedule_profile_digest(about):
+    # Queues at most one refresh per profile key, however many turns ask for it
+    key = profile_key(about.sport_coach, about.details, _llm().model)
+    with _pending_lock:
+        if key in _pending:
+            return
+        _pending.add(key)
+    run_in_background(_refresh_pending, about.id, key)
+
+
+def _refresh_pending(about_id, key):
+    try:
+        refresh_profile_digest(about_id)
+    finally:
+        with _pending_lock:
+            _pending.discard(key)
+
+
+@receiver(post_save, sender=About)
+def fill_profile_digest(sender, instance, **kwargs):
+    transaction.on_commit(lambda: schedule_profile_digest(instance))
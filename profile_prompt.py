@@ -0,0 +1,18 @@
+import hashlib
+
+from langchain_core.prompts import ChatPromptTemplate
+
+# Shared by chat.profile_digest (Django) and lama/profile_digest.py (terminal bots), so
+# both produce the same digests under the same keys. No Django imports here.
+
+# Bump when digest_prompt changes so old digests stop matching
+PROMPT_VERSION = 1
+
+digest_prompt = ChatPromptTemplate.from_template(
+    "Summarize this user profile in 2 sentences, preserving coaching values and favorite players:\n\n{details}"
+)
+
+
+def profile_key(sport, details, model):
+    raw = "\x1f".join([sport or "", details or "", model, str(PROMPT_VERSION)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
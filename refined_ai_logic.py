@@ -1,39 +1,126 @@
+import asyncio
+import logging
+import os
+import time
+from collections import namedtuple
+from contextlib import AsyncExitStack, ExitStack
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
 from django.utils import timezone
 from chat.models import Chat, Message
+from chat.ai_models import ChatSummaryState, GenerationStats
+from chat.context_builder import (
+    CONTEXT_WINDOW, REPLY_RESERVE_TOKENS, abuild_history, build_history, count_tokens,
+)
+from chat.summary_worker import run_in_background, schedule_topic_summary
+from chat.profile_digest import get_profile_digest, schedule_profile_digest
+from chat.profile_prompt import profile_key
+from chat.response_cache import ResponseCache
+from chat.memory_index import MemoryIndex
+from chat.briefings import briefing_messages, briefing_reply, get_briefings, match_briefings
+from chat.llm_client import NUM_PREDICT, GenerationStream, get_embeddings
+from chat.model_router import CHAT, ModelRouter
+from chat.model_router import SUMMARY as SUMMARY_CALL
+from chat.scheduler import INTERACTIVE, SUMMARY, get_scheduler
+from chat.metrics import Timings
+from chat.generation_stats import record_generation
 from about.models import About
-from langchain_ollama import ChatOllama
-from langchain_core.prompts import ChatPromptTemplate
+from django.conf import settings
+from langchain_core.messages import SystemMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
+_bot_user_id = None
 
 # LLM setup llama3.2:3b
-# --- model ---
-llm = ChatOllama(model="llama3.2:3b", 
-                 #base_url="http://localhost:11434",
-                 temperature=0.7,
-                 top_k=40,
-                 top_p=0.9,
-                 repeat_penalty=1.1,
-                 num_ctx=4096)
+# --- models (shared, pooled client from chat.llm_client) ---
+# Summaries and short follow-ups use the small model, analysis turns the large one
+# (falling back to the small one when it is slow or not loaded); see chat.model_router.
+router = ModelRouter(small=getattr(settings, "CHAT_SMALL_MODEL", "llama3.2:3b"),
+                     large=getattr(settings, "CHAT_LARGE_MODEL", "mistral:7b-instruct-q4_K_M"),
+                     slo_seconds=getattr(settings, "CHAT_LARGE_MODEL_SLO_SECONDS", 20),
+                     temperature=0.7,
+                     top_k=40,
+                     top_p=0.9,
+                     repeat_penalty=1.1,
+                     num_ctx=CONTEXT_WINDOW,
+                     num_predict=getattr(settings, "CHAT_NUM_PREDICT", NUM_PREDICT))
+llm = router.llm(router.small)
 output_parser = StrOutputParser()
 
+# --- deadlines ---
+# A turn stops waiting on the model this many seconds after it arrived (queue wait
+# included) and keeps whatever part of the reply was generated; see reply_deadline()
+REPLY_DEADLINE_SECONDS = getattr(settings, "CHAT_REPLY_DEADLINE_SECONDS", 90)
+NO_REPLY_IN_TIME = "[AI Error]: The assistant took too long to answer. Please try again."
 
-def generate_response_from_chat(chat, user, user_input): 
-    # 1. Get About info
-    try:
-        about = user.about
-    except About.DoesNotExist:
-        return "User profile missing. Please complete your About section.", ""
+# --- response cache ---
+# Repeated opening questions ("update me about my favorite team") are answered from
+# chat.response_cache instead of a fresh generation. Only a chat's first turn uses it:
+# later turns ("tell me more") depend on the conversation, which the key does not
+# cover. The semantic tier (nearest cached question by embedding) is off unless
+# CHAT_RESPONSE_CACHE_SEMANTIC is set; see cache_scope() for the key.
+embeddings = get_embeddings(getattr(settings, "CHAT_EMBEDDING_MODEL", "nomic-embed-text"))
+response_cache = ResponseCache(
+    embeddings=embeddings if getattr(settings, "CHAT_RESPONSE_CACHE_SEMANTIC", False) else None,
+    max_scopes=getattr(settings, "CHAT_RESPONSE_CACHE_SEMANTIC_SCOPES", 64),
+    ttl_seconds=getattr(settings, "CHAT_RESPONSE_CACHE_TTL", 6 * 3600),
+    similarity_threshold=getattr(settings, "CHAT_RESPONSE_CACHE_SIMILARITY", 0.97),
+)
 
-    # 2. Build personalized system message
-    system_message = f"""
+# --- long-term memory ---
+# Past turns and topic summaries from all of a coach's chats (plus chat_logs sessions
+# indexed with `python memory_index.py`) are retrieved by similarity, so the prompt only
+# replays the last HISTORY_MESSAGES messages of this chat. Set CHAT_MEMORY_ENABLED =
+# False to go back to replaying as much history as fits.
+MEMORY_TOKENS = getattr(settings, "CHAT_MEMORY_TOKENS", 512)
+HISTORY_MESSAGES = getattr(settings, "CHAT_HISTORY_MESSAGES", 8)
+memory = MemoryIndex(
+    getattr(settings, "CHAT_MEMORY_DIR", os.path.join(settings.BASE_DIR, "chat_memory")),
+    embeddings=embeddings,
+) if getattr(settings, "CHAT_MEMORY_ENABLED", True) else None
+
+# --- chat prompt ---
+# Compiled once. The system text, history and new message are filled in as values, so
+# nothing from the chat is parsed as a template (a "{" in a message is just text).
+chat_prompt = ChatPromptTemplate.from_messages([
+    ("system", "{system_message}"),
+    MessagesPlaceholder("memory", optional=True),
+    MessagesPlaceholder("briefings", optional=True),
+    MessagesPlaceholder("history"),
+    ("human", "{user_input}"),
+])
+
+# --- summaries ---
+# New messages are folded into the previous summary at most this many at a time
+SUMMARY_BATCH_MESSAGES = 8
+
+summary_prompt = ChatPromptTemplate.from_template(
+    "Summarize this conversation into a single paragraph. Focus on what the user asked, what they were interested in, and what the assistant provided:\n\n{chat}"
+)
+incremental_summary_prompt = ChatPromptTemplate.from_template(
+    "Here is a summary of a conversation so far:\n\n{summary}\n\n"
+    "Update it with the new messages below. Keep it to a single paragraph. Focus on what the user asked, what they were interested in, and what the assistant provided:\n\n{chat}"
+)
+
+
+def build_system_message(about):
+    # Short cached digest of about.details when available (see chat.profile_digest)
+    details = get_profile_digest(about)
+    if details is None:
+        schedule_profile_digest(about)
+        details = about.details
+
+    return f"""
     You are a detailed and intelligent sports assistant — like a personal sports analyst — designed to support coaches with insightful updates and tailored guidance. Your job is to respond conversationally — **like ChatGPT normally does**, speaking in a natural (not like a journalist), but with rich detail — just like ESPN or NBA.com — when updating about sports players, teams, or performance.
     This user is a sports coach. They specialize in: **{about.sport_coach}**.
     Here’s what the user said about themselves:
     ---
-    {about.details}
+    {details}
     ---
     Use this info to personalize your answers. When they ask about:
     - a **player**, include their recent performance, season stats, injuries, leadership role, and how the coach can learn from them.
@@ -43,49 +130,419 @@ def generate_response_from_chat(chat, user, user_input):
     Avoid sounding like a news presenter or reporter. Respond like a helpful assistant or analyst who knows the user’s interest the latest and shares it clearly and casually.Be casual, insightful, and sport-specific.
     """
 
-    # 3. Collect chat history
-    chat_history = [("system", system_message)]
-    messages = Message.objects.filter(chat=chat).order_by("timestamp")
 
-    for msg in messages:
-        role = "user" if msg.sender == user else "assistant"
-        chat_history.append((role, msg.content))
+def cache_scope(about, llm):
+    # Same profile + the model that answers, with the same settings -> answers can be shared
+    return ":".join([
+        profile_key(about.sport_coach, about.details, llm.model),
+        str(llm.temperature), str(llm.top_k), str(llm.top_p), str(llm.repeat_penalty),
+    ])
 
-    # 4. Append current message
-    chat_history.append(("user", user_input.strip()))
 
-    # 5. Generate response
-    prompt = ChatPromptTemplate.from_messages(chat_history)
-    chain = prompt | llm | output_parser
-    try:
-        response = chain.invoke({}).strip()
-    except Exception as e:
-        return f"[AI Error]: {str(e)}", ""
-
-    # 6. Save both messages
-    bot_user, _ = User.objects.get_or_create(username="chatbot")
-    chat.participants.add(bot_user)
-    Message.objects.create(chat=chat, sender=user, content=user_input.strip())
-    Message.objects.create(chat=chat, sender=bot_user, content=response)
-
-    # 7. Update chat duration
-    chat.total_chat_duration = timezone.now() - chat.created_at
-
-    # 8. Auto-summary
-    full_chat_text = "\n".join(
-        f"{'User' if msg.sender == user else 'Assistant'}: {msg.content}"
-        for msg in messages
-    ) + f"\nUser: {user_input.strip()}\nAssistant: {response}"
-
-    summary_prompt = ChatPromptTemplate.from_template(
-        "Summarize this conversation into a single paragraph. Focus on what the user asked, what they were interested in, and what the assistant provided:\n\n{chat}"
-    )
-    summary_chain = summary_prompt | llm | output_parser
+def is_first_turn(chat):
+    return not Message.objects.filter(chat=chat).exists()
+
+
+def recall(chat, user, user_input):
+    # Memory notes for this turn as a system message ([] when nothing relevant). This
+    # chat's own turns are skipped: recent ones are in the history, older ones are
+    # covered by its topic summary.
+    if memory is None:
+        return []
     try:
-        summary_text = summary_chain.invoke({"chat": full_chat_text}).strip()
-        chat.topic_summary = summary_text
-        chat.save()
+        vector = memory.embed_query(user_input)
     except Exception:
-        pass  # Fail silently if summarization fails
+        logger.warning("Embedding failed, memory recall skipped", exc_info=True)
+        return []
+    items = memory.search(
+        user.username, vector, budget_tokens=MEMORY_TOKENS, count_tokens=count_tokens,
+        exclude=lambda item: item.get("kind") == "turn" and item.get("chat_id") == chat.id,
+    )
+    if not items:
+        return []
+    notes = "\n".join(f"- {item['text']}" for item in items)
+    return [SystemMessage(f"Relevant notes from this coach's earlier conversations:\n{notes}")]
+
+
+def history_limits(context_messages):
+    # (token budget, max messages) for the verbatim history next to memory notes/briefings
+    used = sum(count_tokens(m.content) for m in context_messages)
+    return CONTEXT_WINDOW - REPLY_RESERVE_TOKENS - used, HISTORY_MESSAGES if memory is not None else None
+
+
+def remember(username, items):
+    if memory is not None:
+        memory.add(username, items)
+
+
+def remember_turn(username, chat_id, message_id, user_input, response):
+    # One snippet per exchange, keyed by the reply so re-indexing replaces it
+    remember(username, [{
+        "text": f"Coach: {user_input}\nAssistant: {response}"[:600],
+        "key": f"turn:{message_id}", "kind": "turn", "chat_id": chat_id,
+    }])
+
+
+def build_chat_prompt(chat, user, about, user_input, timings, briefings=()):
+    # 2. Build personalized system message
+    with timings.stage("system_prompt"):
+        system_message = build_system_message(about)
+
+    # 3a. Relevant notes from earlier chats (long-term memory) + matching briefings
+    with timings.stage("memory_lookup"):
+        memory_messages = recall(chat, user, user_input.strip())
+        briefing_context = briefing_messages(briefings)
+
+    # 3b. Collect as much recent chat history as fits the token budget
+    with timings.stage("history_query"):
+        budget, max_messages = history_limits(memory_messages + briefing_context)
+        history = build_history(chat, user, system_message, user_input.strip(), budget, max_messages)
+
+    # 4. Append current message
+    with timings.stage("prompt_build"):
+        return chat_prompt.invoke({
+            "system_message": system_message,
+            "memory": memory_messages,
+            "briefings": briefing_context,
+            "history": history,
+            "user_input": user_input.strip(),
+        })
+
+
+async def abuild_chat_prompt(chat, user, about, user_input, timings, briefings=()):
+    # build_chat_prompt for the async views; same prompt, async history query
+    with timings.stage("system_prompt"):
+        system_message = await sync_to_async(build_system_message)(about)
+
+    with timings.stage("memory_lookup"):
+        memory_messages = await sync_to_async(recall, thread_sensitive=False)(chat, user, user_input.strip())
+        briefing_context = briefing_messages(briefings)
+
+    with timings.stage("history_query"):
+        budget, max_messages = history_limits(memory_messages + briefing_context)
+        history = await abuild_history(chat, user, system_message, user_input.strip(), budget, max_messages)
+
+    with timings.stage("prompt_build"):
+        return chat_prompt.invoke({
+            "system_message": system_message,
+            "memory": memory_messages,
+            "briefings": briefing_context,
+            "history": history,
+            "user_input": user_input.strip(),
+        })
+
+
+def reply_deadline(timeout=None):
+    # time.monotonic() deadline for a turn starting now. A client's own timeout (the
+    # views read X-Request-Timeout) can shorten it, never extend it.
+    seconds = REPLY_DEADLINE_SECONDS if timeout is None else min(timeout, REPLY_DEADLINE_SECONDS)
+    return time.monotonic() + seconds
+
+
+def time_left(deadline):
+    return max(0.0, deadline - time.monotonic())
+
+
+def get_bot_user_id():
+    # The chatbot user never changes, so look it up once per process
+    global _bot_user_id
+    if _bot_user_id is None:
+        bot_user, _ = User.objects.get_or_create(username="chatbot")
+        _bot_user_id = bot_user.id
+    return _bot_user_id
+
+
+def save_turn(chat, user, user_input, response, metadata=None):
+    bot_user_id = get_bot_user_id()
+    with transaction.atomic():
+        # 6. Save both messages in one INSERT
+        chat.participants.add(bot_user_id)
+        user_message, bot_message = Message.objects.bulk_create([
+            Message(chat=chat, sender=user, content=user_input.strip()),
+            Message(chat=chat, sender_id=bot_user_id, content=response),
+        ])
+        # Ollama token/timing metadata for the reply (absent on cache hits)
+        record_generation(metadata, GenerationStats.KIND_REPLY, llm.model, chat=chat, message=bot_message, user=user)
+
+        # 7. Update chat duration
+        chat.total_chat_duration = timezone.now() - chat.created_at
+        chat.save(update_fields=["total_chat_duration"])
+
+        # 8. Auto-summary runs in the background worker, debounced per chat; the
+        # exchange is added to the coach's long-term memory there too
+        transaction.on_commit(lambda: schedule_topic_summary(chat.id, user.id))
+        if memory is not None:
+            transaction.on_commit(lambda: run_in_background(
+                remember_turn, user.username, chat.id, bot_message.id, user_input.strip(), response
+            ))
+    return user_message, bot_message
+
+
+def format_chat_log(chat, user):
+    rows = Message.objects.filter(chat=chat).order_by("timestamp", "id").values_list("sender_id", "content")
+    return "\n".join(
+        f"{'User' if sender_id == user.id else 'Assistant'}: {content}"
+        for sender_id, content in rows
+    )
+
+
+async def aformat_chat_log(chat, user):
+    rows = Message.objects.filter(chat=chat).order_by("timestamp", "id").values_list("sender_id", "content")
+    return "\n".join([
+        f"{'User' if sender_id == user.id else 'Assistant'}: {content}"
+        async for sender_id, content in rows
+    ])
+
+
+def build_summary_input(previous_summary, new_messages, user):
+    # Only the previous summary and the not-yet-summarized messages go to the model,
+    # so the prompt is bounded by SUMMARY_BATCH_MESSAGES, not by the chat length.
+    chat_text = "\n".join(
+        f"{'User' if msg.sender_id == user.id else 'Assistant'}: {msg.content}"
+        for msg in new_messages
+    )
+    if previous_summary:
+        return incremental_summary_prompt, {"summary": previous_summary, "chat": chat_text}
+    return summary_prompt, {"chat": chat_text}
+
+
+def update_topic_summary(chat, user, rebuild=False, priority=SUMMARY):
+    # Called by chat.summary_worker, never on the request path. rebuild=True ignores the
+    # watermark and the old summary (backfill after a prompt/model change).
+    state, _ = ChatSummaryState.objects.get_or_create(chat=chat)
+    watermark = 0 if rebuild else state.last_message_id
+    new_messages = list(
+        Message.objects.filter(chat=chat, id__gt=watermark).order_by("id")
+    )
+    if not new_messages:
+        return
+
+    summary_text = chat.topic_summary if watermark else ""
+    for start in range(0, len(new_messages), SUMMARY_BATCH_MESSAGES):
+        batch = new_messages[start:start + SUMMARY_BATCH_MESSAGES]
+        prompt, inputs = build_summary_input(summary_text, batch, user)
+        route = router.route(SUMMARY_CALL)
+        summary_chain = prompt | route.llm
+        with get_scheduler(route.model).slot(priority), Timings().stage("summary"):
+            message = summary_chain.invoke(inputs)
+        summary_text = message.content.strip()
+        record_generation(message.response_metadata, GenerationStats.KIND_SUMMARY, route.model, chat=chat, user=user)
+
+    chat.topic_summary = summary_text
+    chat.save(update_fields=["topic_summary"])
+    state.last_message_id = new_messages[-1].id
+    state.save(update_fields=["last_message_id", "updated_at"])
+    remember(user.username, [{"text": summary_text, "key": f"summary:{chat.id}", "kind": "summary", "chat_id": chat.id}])
+
+
+# --- one chat turn ---
+# The four entry points below run the same turn: prepare_turn() before the model and
+# finish_turn() after it. They only differ in how they wait on the model (a thread or
+# the event loop), and the blocking ones just collect the streamed events.
+PROFILE_MISSING = "User profile missing. Please complete your About section."
+
+Turn = namedtuple("Turn", "about route scope cacheable reply briefings")
+
+
+def prepare_turn(chat, user, user_input, timings):
+    # Everything before the model. Turn.reply is set when no generation is needed
+    # (cache or briefing hit); None when the coach has no About profile.
+    # 1. Get About info
+    with timings.stage("about_lookup"):
+        try:
+            about = user.about
+        except About.DoesNotExist:
+            return None
+
+    # 5a. Cached answer for a repeated opening question, from the model this turn routes to
+    route = router.route(CHAT, user_input)
+    with timings.stage("cache_lookup"):
+        scope = cache_scope(about, route.llm)
+        cacheable = is_first_turn(chat)
+        reply = response_cache.get(user_input, scope) if cacheable else None
+
+    # 5b. "How is my team doing?" is answered from the precomputed briefing (chat.briefings)
+    briefings = []
+    if reply is None:
+        with timings.stage("briefing_lookup"):
+            briefings = match_briefings(get_briefings(about), user_input)
+            reply = briefing_reply(briefings, user_input)
+    return Turn(about, route, scope, cacheable, reply, briefings)
+
+
+def finish_turn(chat, user, user_input, turn, generation, timings):
+    # Everything after the model stopped (done, cut off or closed by the client).
+    # Returns save_turn()'s (user_message, bot_message), or None when the deadline cut
+    # the reply off before any text, so there is nothing to save.
+    router.observe(turn.route, generation.elapsed)
+    timings.record_generation(generation)
+    if generation.cut_off and not generation.text:
+        record_generation(generation.metadata, GenerationStats.KIND_REPLY, turn.route.model, chat=chat, user=user)
+        return None
+    if turn.cacheable and generation.done_reason == "stop":
+        response_cache.put(user_input, turn.scope, generation.text)
+
+    # 6-8. Save both messages (+ generation stats) and duration, queue the summary
+    with timings.stage("db_write"):
+        return save_turn(chat, user, user_input, generation.text, generation.metadata)
+
+
+def done_event(reply, done_reason, saved):
+    user_message, bot_message = saved
+    return {
+        "event": "done",
+        "reply": reply,
+        "done_reason": done_reason,
+        "user_message_id": user_message.id,
+        "assistant_message_id": bot_message.id,
+    }
+
+
+def stream_response_from_chat(chat, user, user_input, timings=None, deadline=None):
+    # Yields events as tokens arrive:
+    #   {"event": "token", "text": ...} for each chunk from llm.stream()
+    #   {"event": "done", ...} once the full reply is saved; done_reason is "deadline"
+    #       or "length" (num_predict) when the reply was cut short
+    #   {"event": "error", "error": ...} if the profile is missing or the model fails
+    # Closing the generator mid-reply (the client went away) stops the model; the
+    # partial reply is still saved.
+    timings = timings or Timings()
+    deadline = deadline or reply_deadline()
+
+    turn = prepare_turn(chat, user, user_input, timings)
+    if turn is None:
+        yield {"event": "error", "error": PROFILE_MISSING}
+        return
+    if turn.reply is not None:
+        # Saved before it goes out: the client may close the stream right after the token
+        with timings.stage("db_write"):
+            saved = save_turn(chat, user, user_input, turn.reply)
+        yield {"event": "token", "text": turn.reply}
+        yield done_event(turn.reply, "stop", saved)
+        return
+
+    # 2-4. Build prompt from profile + history
+    prompt = build_chat_prompt(chat, user, turn.about, user_input, timings, turn.briefings)
+
+    # 5. Stream response (raises scheduler.Overloaded before the first event when the
+    # model is saturated or the deadline passes in the queue)
+    disconnected = False
+    with ExitStack() as slot:
+        with timings.stage("queue_wait"):
+            slot.enter_context(get_scheduler(turn.route.model).slot(
+                INTERACTIVE, user_id=user.id, timeout=time_left(deadline)
+            ))
+        generation = GenerationStream(turn.route.llm, prompt, deadline)
+        chunks = generation.stream()
+        try:
+            for text in chunks:
+                yield {"event": "token", "text": text}
+        except GeneratorExit:
+            # Closed by the view: stop the model, then save without yielding again
+            chunks.close()
+            disconnected = True
+        except Exception as e:
+            yield {"event": "error", "error": f"[AI Error]: {str(e)}"}
+            return
+
+    saved = finish_turn(chat, user, user_input, turn, generation, timings)
+    if disconnected:
+        return
+    if saved is None:
+        yield {"event": "error", "error": NO_REPLY_IN_TIME}
+        return
+    yield done_event(generation.text, generation.done_reason, saved)
+
+
+def generate_response_from_chat(chat, user, user_input, timings=None, deadline=None):
+    # stream_response_from_chat, collected: returns (reply, chat_log), or (error, "").
+    # Pass a metrics.Timings to get per-stage timings back (the view does in DEBUG)
+    timings = timings or Timings()
+    reply = error = None
+    for event in stream_response_from_chat(chat, user, user_input, timings, deadline):
+        if event["event"] == "error":
+            error = event["error"]
+        elif event["event"] == "done":
+            reply = event["reply"]
+    if error is not None:
+        return error, ""
+
+    with timings.stage("chat_log"):
+        chat_log = format_chat_log(chat, user)
+    return reply, chat_log
+
+
+# --- async variants ---
+# Used by the async views: while a turn waits on the model it holds no thread, so one
+# ASGI worker can keep many conversations in flight. The steps around the model
+# (prepare_turn, finish_turn, save_turn) still run in a thread via sync_to_async.
+
+async def astream_response_from_chat(chat, user, user_input, timings=None, deadline=None):
+    # Async generator with the same events as stream_response_from_chat. Cancelling the
+    # task or closing the generator mid-reply stops the model like closing the sync one.
+    timings = timings or Timings()
+    deadline = deadline or reply_deadline()
+
+    turn = await sync_to_async(prepare_turn)(chat, user, user_input, timings)
+    if turn is None:
+        yield {"event": "error", "error": PROFILE_MISSING}
+        return
+    if turn.reply is not None:
+        # Saved before it goes out: the client may close the stream right after the token
+        with timings.stage("db_write"):
+            saved = await sync_to_async(save_turn)(chat, user, user_input, turn.reply)
+        yield {"event": "token", "text": turn.reply}
+        yield done_event(turn.reply, "stop", saved)
+        return
+
+    # 2-4. Build prompt from profile + history
+    prompt = await abuild_chat_prompt(chat, user, turn.about, user_input, timings, turn.briefings)
+
+    # 5. Stream response (raises scheduler.Overloaded before the first event)
+    disconnected = None
+    async with AsyncExitStack() as slot:
+        with timings.stage("queue_wait"):
+            await slot.enter_async_context(get_scheduler(turn.route.model).aslot(
+                INTERACTIVE, user_id=user.id, timeout=time_left(deadline)
+            ))
+        generation = GenerationStream(turn.route.llm, prompt, deadline)
+        chunks = generation.astream()
+        try:
+            async for text in chunks:
+                yield {"event": "token", "text": text}
+        except (asyncio.CancelledError, GeneratorExit) as e:
+            # Cancelled or closed by the view: stop the model, then save without
+            # yielding again
+            await chunks.aclose()
+            disconnected = e
+        except Exception as e:
+            yield {"event": "error", "error": f"[AI Error]: {str(e)}"}
+            return
+
+    saved = await sync_to_async(finish_turn)(chat, user, user_input, turn, generation, timings)
+    if isinstance(disconnected, asyncio.CancelledError):
+        raise disconnected
+    if disconnected:
+        return
+    if saved is None:
+        yield {"event": "error", "error": NO_REPLY_IN_TIME}
+        return
+    yield done_event(generation.text, generation.done_reason, saved)
+
+
+async def agenerate_response_from_chat(chat, user, user_input, timings=None, deadline=None):
+    # astream_response_from_chat, collected. A cancelled view (client disconnected)
+    # cancels the stream, which stops the model and saves the partial reply first.
+    timings = timings or Timings()
+    reply = error = None
+    async for event in astream_response_from_chat(chat, user, user_input, timings, deadline):
+        if event["event"] == "error":
+            error = event["error"]
+        elif event["event"] == "done":
+            reply = event["reply"]
+    if error is not None:
+        return error, ""
 
-    return response, full_chat_text
\ No newline at end of file
+    with timings.stage("chat_log"):
+        chat_log = await aformat_chat_log(chat, user)
+    return reply, chat_log
@@ -0,0 +1,153 @@
+import functools
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(text):
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+
+class _SemanticIndex:
+    # Cosine index over unit-normalized question embeddings for one scope
+
+    def __init__(self):
+        self.vectors = []
+        self.entries = []  # [response, expires_at, last_used]
+        self._matrix = None
+
+    def search(self, vector, now):
+        if not self.entries:
+            return None, 0.0
+        if self._matrix is None:
+            self._matrix = np.vstack(self.vectors)
+        scores = self._matrix @ vector
+        for i, entry in enumerate(self.entries):
+            if entry[1] < now:
+                scores[i] = -1.0
+        best = int(np.argmax(scores))
+        return best, float(scores[best])
+
+    def add(self, vector, response, expires_at, now):
+        self.vectors.append(vector)
+        self.entries.append([response, expires_at, now])
+        self._matrix = None
+
+    def evict(self, max_entries, now):
+        # Drops expired entries, then the least recently used beyond max_entries.
+        # Returns how many live entries had to go.
+        keep = [i for i, entry in enumerate(self.entries) if entry[1] >= now]
+        evicted = max(0, len(keep) - max_entries)
+        if evicted:
+            keep.sort(key=lambda i: self.entries[i][2])
+            keep = sorted(keep[-max_entries:])
+        if len(keep) != len(self.entries):
+            self.vectors = [self.vectors[i] for i in keep]
+            self.entries = [self.entries[i] for i in keep]
+            self._matrix = None
+        return evicted
+
+
+class ResponseCache:
+    # Two tiers in front of the reply chain:
+    #   exact    - normalized question + scope (profile hash + model params), LRU + TTL
+    #   semantic - nearest cached question within the same scope, by embedding cosine
+    #              similarity >= similarity_threshold; skipped when embeddings is None.
+    #              Keep the threshold high: "favorite team" and "favorite player" are
+    #              close in embedding space but need different answers. At most
+    #              max_scopes scopes are indexed, least recently used dropped first.
+
+    def __init__(self, embeddings=None, max_entries=1024, max_entries_per_scope=128,
+                 max_scopes=64, ttl_seconds=6 * 3600, similarity_threshold=0.97):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.max_entries_per_scope = max_entries_per_scope
+        self.max_scopes = max_scopes
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.metrics = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0}
+        self._exact = OrderedDict()  # (scope, question) -> (response, expires_at)
+        self._semantic = OrderedDict()  # scope -> _SemanticIndex, LRU
+        self._lock = threading.Lock()
+        self._embed = functools.lru_cache(maxsize=max_entries)(self._embed_uncached)
+
+    def _embed_uncached(self, question):
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, question, scope):
+        question = normalize_question(question)
+        now = time.monotonic()
+        with self._lock:
+            hit = self._exact.get((scope, question))
+            if hit is not None and hit[1] >= now:
+                self._exact.move_to_end((scope, question))
+                self.metrics["exact_hits"] += 1
+                return hit[0]
+
+        vector = self._try_embed(question)
+        with self._lock:
+            index = self._semantic.get(scope)
+            if vector is not None and index is not None:
+                self._semantic.move_to_end(scope)
+                best, score = index.search(vector, now)
+                if best is not None and score >= self.similarity_threshold:
+                    index.entries[best][2] = now
+                    self.metrics["semantic_hits"] += 1
+                    return index.entries[best][0]
+            self.metrics["misses"] += 1
+        return None
+
+    def put(self, question, scope, response):
+        question = normalize_question(question)
+        now = time.monotonic()
+        expires_at = now + self.ttl_seconds
+        vector = self._try_embed(question)
+        with self._lock:
+            self._exact[(scope, question)] = (response, expires_at)
+            self._exact.move_to_end((scope, question))
+            while len(self._exact) > self.max_entries:
+                self._exact.popitem(last=False)
+                self.metrics["evictions"] += 1
+            if vector is not None:
+                index = self._semantic.setdefault(scope, _SemanticIndex())
+                self._semantic.move_to_end(scope)
+                index.add(vector, response, expires_at, now)
+                self.metrics["evictions"] += index.evict(self.max_entries_per_scope, now)
+                while len(self._semantic) > self.max_scopes:
+                    _, dropped = self._semantic.popitem(last=False)
+                    self.metrics["evictions"] += len(dropped.entries)
+
+    def _try_embed(self, question):
+        if self.embeddings is None:
+            return None
+        try:
+            return self._embed(question)
+        except Exception:
+            logger.warning("Embedding failed, semantic cache tier skipped", exc_info=True)
+            return None
+
+    def hit_rate(self):
+        hits = self.metrics["exact_hits"] + self.metrics["semantic_hits"]
+        total = hits + self.metrics["misses"]
+        return hits / total if total else 0.0
+
+    def render_prometheus(self):
+        with self._lock:
+            metrics = dict(self.metrics)
+        lines = ["# HELP chat_response_cache_lookups_total Response cache lookups by result.",
+                 "# TYPE chat_response_cache_lookups_total counter"]
+        for result, key in (("exact_hit", "exact_hits"), ("semantic_hit", "semantic_hits"), ("miss", "misses")):
+            lines.append(f'chat_response_cache_lookups_total{{result="{result}"}} {metrics[key]}')
+        lines += ["# HELP chat_response_cache_evictions_total Cached replies dropped to stay within the size limits.",
+                  "# TYPE chat_response_cache_evictions_total counter",
+                  f"chat_response_cache_evictions_total {metrics['evictions']}"]
+        return "\n".join(lines) + "\n"
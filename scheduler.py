@@ -0,0 +1,162 @@
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+# --- priority classes (lower runs first) ---
+INTERACTIVE = 0
+SUMMARY = 1
+BATCH = 2
+
+# --- settings ---
+# All limits are per process: nothing here is shared between gunicorn workers or
+# management commands. With N workers in front of one Ollama server, set
+# LLM_MAX_CONCURRENCY to OLLAMA_NUM_PARALLEL / N (at least 1), and expect the user
+# rate limit to be N times as lenient unless requests stick to one worker.
+MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "2"))
+MAX_QUEUE = int(os.environ.get("LLM_MAX_QUEUE", "8"))
+# Per-user fair share: USER_BURST turns right away, then USER_RATE turns per second
+USER_RATE = float(os.environ.get("LLM_USER_RATE", "0.2"))
+USER_BURST = float(os.environ.get("LLM_USER_BURST", "3"))
+# Full buckets are dropped once more than this many users have one
+MAX_BUCKETS = int(os.environ.get("LLM_MAX_USER_BUCKETS", "1024"))
+
+
+class Overloaded(Exception):
+    # Raised instead of queueing; callers turn it into 429 + Retry-After
+    def __init__(self, retry_after, reason="LLM server is busy"):
+        super().__init__(reason)
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def full(self, now):
+        # A full bucket is no different from a new one, so it can be dropped
+        self._refill(now)
+        return self.tokens >= self.burst
+
+    def take(self):
+        # Returns 0 when a token was taken, otherwise seconds until one is available
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class ModelScheduler:
+    # Bounded concurrency for one model. Waiters are served by priority class, then
+    # FIFO; when MAX_QUEUE callers are already waiting, new ones are shed right away.
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, max_queue=MAX_QUEUE,
+                 user_rate=USER_RATE, user_burst=USER_BURST, max_buckets=MAX_BUCKETS):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_buckets = max_buckets
+        self.avg_seconds = 10.0  # EWMA of slot hold time, used for Retry-After
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = []
+        self._seq = itertools.count()
+        self._buckets = {}
+
+    def queue_depth(self):
+        with self._cond:
+            return len(self._waiting)
+
+    def _retry_after(self):
+        return self.avg_seconds * (len(self._waiting) + 1) / self.max_concurrency
+
+    def _take_user_token(self, user_id):
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            if len(self._buckets) >= self.max_buckets:
+                now = time.monotonic()
+                self._buckets = {uid: b for uid, b in self._buckets.items() if not b.full(now)}
+            bucket = self._buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+        wait = bucket.take()
+        if wait:
+            raise Overloaded(wait, "Too many requests for this user")
+
+    def _acquire(self, priority, user_id, timeout):
+        with self._cond:
+            # Shed before charging the user, so a busy server does not use up their burst
+            if self._active >= self.max_concurrency and len(self._waiting) >= self.max_queue:
+                raise Overloaded(self._retry_after())
+            if user_id is not None:
+                self._take_user_token(user_id)
+
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while self._active >= self.max_concurrency or self._waiting[0] != ticket:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                    raise Overloaded(self._retry_after())
+                self._cond.wait(remaining)
+            heapq.heappop(self._waiting)
+            self._active += 1
+            # The next waiter may also fit if more than one slot is free
+            self._cond.notify_all()
+        return time.monotonic()
+
+    def _release(self, started):
+        with self._cond:
+            self._active -= 1
+            self.avg_seconds = 0.8 * self.avg_seconds + 0.2 * (time.monotonic() - started)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority=INTERACTIVE, user_id=None, timeout=None):
+        started = self._acquire(priority, user_id, timeout)
+        try:
+            yield
+        finally:
+            self._release(started)
+
+    @asynccontextmanager
+    async def aslot(self, priority=INTERACTIVE, user_id=None, timeout=None):
+        # Same queue as slot(), shared with sync callers. Waiting happens in a worker
+        # thread so the event loop keeps running; at most max_queue threads wait at once.
+        acquire = asyncio.ensure_future(asyncio.to_thread(self._acquire, priority, user_id, timeout))
+        try:
+            started = await asyncio.shield(acquire)
+        except asyncio.CancelledError:
+            # The thread may still get the slot after we gave up; hand it straight back
+            acquire.add_done_callback(
+                lambda f: f.cancelled() or f.exception() or self._release(f.result())
+            )
+            raise
+        try:
+            yield
+        finally:
+            self._release(started)
+
+
+_lock = threading.Lock()
+_schedulers = {}
+
+
+def get_scheduler(model):
+    with _lock:
+        if model not in _schedulers:
+            _schedulers[model] = ModelScheduler()
+        return _schedulers[model]
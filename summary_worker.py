@@ -0,0 +1,82 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.contrib.auth import get_user_model
+
+from chat.models import Chat
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+# --- settings ---
+# A burst of turns in one chat within DEBOUNCE_SECONDS produces a single summary.
+# MAX_WORKERS caps how many summary calls can hit the model at once, so summaries
+# never take more than that many slots away from interactive replies.
+DEBOUNCE_SECONDS = getattr(settings, "TOPIC_SUMMARY_DEBOUNCE_SECONDS", 5.0)
+MAX_WORKERS = getattr(settings, "TOPIC_SUMMARY_MAX_WORKERS", 1)
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="topic-summary")
+_lock = threading.Lock()
+_timers = {}      # chat_id -> pending threading.Timer
+_running = set()  # chat_ids currently being summarized
+
+
+def schedule_topic_summary(chat_id, user_id):
+    # (Re)start the debounce timer for this chat; only the last call in a burst fires.
+    with _lock:
+        timer = _timers.pop(chat_id, None)
+        if timer is not None:
+            timer.cancel()
+        timer = threading.Timer(DEBOUNCE_SECONDS, _submit, args=(chat_id, user_id))
+        timer.daemon = True
+        _timers[chat_id] = timer
+        timer.start()
+
+
+def _submit(chat_id, user_id):
+    with _lock:
+        _timers.pop(chat_id, None)
+        if chat_id in _running:
+            # A summary for this chat is still in flight; try again after it.
+            busy = True
+        else:
+            _running.add(chat_id)
+            busy = False
+    if busy:
+        schedule_topic_summary(chat_id, user_id)
+        return
+    _executor.submit(_run, chat_id, user_id)
+
+
+def run_in_background(fn, *args):
+    # Other low-priority model jobs (e.g. profile digests) share the same bounded pool
+    _executor.submit(_run_job, fn, *args)
+
+
+def _run_job(fn, *args):
+    close_old_connections()
+    try:
+        fn(*args)
+    except Exception:
+        logger.exception("Background job %s failed", getattr(fn, "__name__", fn))
+    finally:
+        close_old_connections()
+
+
+def _run(chat_id, user_id):
+    from chat.ai_logic import update_topic_summary
+
+    close_old_connections()
+    try:
+        chat = Chat.objects.get(id=chat_id)
+        user = User.objects.get(id=user_id)
+        update_topic_summary(chat, user)
+    except Exception:
+        logger.exception("Topic summary failed for chat %s", chat_id)
+    finally:
+        with _lock:
+            _running.discard(chat_id)
+        close_old_connections()
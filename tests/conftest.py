@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The lama/ scripts and bench/ import repo-root modules (llm_client, ...) and each other
+# by plain name, the way they are run; tests import them the same way. Tests that need
+# Django (chat.*) run from the project, with pytest-django and its settings.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "lama"), os.path.join(ROOT, "bench")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
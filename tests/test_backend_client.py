@@ -0,0 +1,116 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from backend_client import BackendClient
+from fake_backend import FakeBackend
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def backend():
+    server = FakeBackend().start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_client(backend):
+    clients = []
+
+    def make(**kwargs):
+        client = BackendClient(backend.base_url, **kwargs)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close(timeout=1)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_about_is_cached_within_ttl(backend, make_client):
+    client = make_client(about_ttl=60)
+    assert client.get_about() == backend.about
+    assert client.get_about() == backend.about
+    assert backend.stats["about"] == 1
+
+
+def test_expired_about_is_revalidated_with_etag(backend, make_client):
+    client = make_client(about_ttl=0.05)
+    first = client.get_about()
+    time.sleep(0.1)
+    assert client.get_about() == first
+    assert backend.stats == {**backend.stats, "about": 2, "about_not_modified": 1}
+
+
+def test_changed_about_is_refetched_after_ttl(backend, make_client):
+    client = make_client(about_ttl=0.05)
+    client.get_about()
+    backend.about = {"sport_coach": "Soccer", "details": "U12 team"}
+    assert client.get_about()["sport_coach"] == "Basketball"  # still fresh
+    time.sleep(0.1)
+    assert client.get_about() == {"sport_coach": "Soccer", "details": "U12 team"}
+    assert backend.stats["about_not_modified"] == 0
+
+
+def test_invalidate_about_forces_revalidation(backend, make_client):
+    client = make_client(about_ttl=60)
+    client.get_about()
+    client.invalidate_about()
+    client.get_about()
+    assert backend.stats["about_not_modified"] == 1
+
+
+def test_saves_are_sent_in_order(backend, make_client):
+    client = make_client(flush_interval=0.01)
+    for i in range(5):
+        client.save_message(7, f"message {i}")
+    assert client.flush(timeout=5)
+    assert backend.messages == [{"chat": 7, "content": f"message {i}"} for i in range(5)]
+    assert client.stats == {"saved": 5, "retried": 0, "dropped": 0}
+
+
+def test_save_is_retried_after_5xx(backend, make_client):
+    backend.fail_rate = 1.0
+    client = make_client(flush_interval=0.01)
+    client.save_message(7, "hello")
+    wait_for(lambda: backend.stats["save_failures"] >= 1)
+    backend.fail_rate = 0.0
+    assert client.flush(timeout=5)
+    assert backend.messages == [{"chat": 7, "content": "hello"}]
+    assert client.stats["saved"] == 1 and client.stats["retried"] >= 1 and client.stats["dropped"] == 0
+
+
+def test_save_is_dropped_after_max_attempts(backend, make_client):
+    backend.fail_rate = 1.0
+    client = make_client(flush_interval=0.01, max_attempts=2)
+    client.save_message(7, "hello")
+    assert client.flush(timeout=5)
+    assert backend.stats["save_failures"] == 2
+    assert client.stats == {"saved": 0, "retried": 1, "dropped": 1}
+
+
+def test_queued_saves_are_flushed_at_exit(backend):
+    # A long flush_interval keeps the saves queued until the interpreter exits
+    script = (
+        "import sys\n"
+        f"sys.path.insert(0, {os.path.join(ROOT, 'lama')!r})\n"
+        "from backend_client import BackendClient\n"
+        f"client = BackendClient({backend.base_url!r}, flush_interval=30)\n"
+        "for i in range(3):\n"
+        "    client.save_message(7, f'message {i}')\n"
+    )
+    subprocess.run([sys.executable, "-c", script], check=True, timeout=30)
+    assert backend.messages == [{"chat": 7, "content": f"message {i}"} for i in range(3)]
@@ -0,0 +1,28 @@
+import pytest
+
+pytest.importorskip("pytest_django")
+
+from chat.briefings import match_briefings  # noqa: E402
+
+BRIEFINGS = [
+    {"kind": "team", "name": "Miami Heat", "briefing": "..."},
+    {"kind": "team", "name": "Heat", "briefing": "..."},
+    {"kind": "player", "name": "Stephen Curry", "briefing": "..."},
+]
+
+
+def names(user_input):
+    return [b["name"] for b in match_briefings(BRIEFINGS, user_input)]
+
+
+def test_names_match_whole_words():
+    assert names("We had a heated practice today") == []
+    assert names("How are the Heat doing?") == ["Heat"]
+    assert names("any news on the miami  heat?") == ["Miami Heat", "Heat"]
+    assert names("Stephen Curry's form lately?") == ["Stephen Curry"]
+    assert names("Stephen Currying favour") == []
+
+
+def test_my_team_falls_back_to_kind():
+    assert names("how is my team doing") == ["Miami Heat", "Heat"]
+    assert names("update on my favourite player") == ["Stephen Curry"]
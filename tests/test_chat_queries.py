@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("pytest_django")
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+from chat.ai_logic import format_chat_log, get_bot_user_id, save_turn  # noqa: E402
+from chat.context_builder import build_history  # noqa: E402
+from chat.models import Chat, Message  # noqa: E402
+
+User = get_user_model()
+
+
+def make_chat(message_count):
+    user = User.objects.create(username=f"coach{message_count}")
+    bot_user_id = get_bot_user_id()
+    chat = Chat.objects.create()
+    chat.participants.add(user, bot_user_id)
+    Message.objects.bulk_create(
+        Message(chat=chat, sender_id=user.id if i % 2 == 0 else bot_user_id, content=f"message {i}")
+        for i in range(message_count)
+    )
+    return chat, user
+
+
+def turn_queries(chat, user):
+    # Everything the sync chat path reads and writes around the model call
+    with CaptureQueriesContext(connection) as queries:
+        build_history(chat, user, "system", "question", budget=10 ** 6)
+        format_chat_log(chat, user)
+        save_turn(chat, user, "question", "answer")
+    return len(queries)
+
+
+@pytest.mark.django_db
+def test_turn_queries_do_not_grow_with_history():
+    small = make_chat(10)
+    large = make_chat(500)
+    # Warm the token-count cache and the bot user lookup, as earlier turns would have
+    turn_queries(*small)
+    turn_queries(*large)
+    assert turn_queries(*large) == turn_queries(*small)
+
+
+@pytest.mark.django_db
+def test_message_history_index_exists():
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, Message._meta.db_table)
+    assert any(c["index"] and c["columns"][:2] == ["chat_id", "timestamp"] for c in constraints.values())
@@ -0,0 +1,24 @@
+import pytest
+
+pytest.importorskip("pytest_django")
+
+from about.models import About  # noqa: E402
+from chat import ai_logic  # noqa: E402
+from chat.models import Chat, Message  # noqa: E402
+
+
+@pytest.mark.django_db
+def test_cached_reply_is_saved_when_the_client_leaves_after_the_token(monkeypatch, django_user_model):
+    user = django_user_model.objects.create(username="coach_james")
+    About.objects.create(user=user, sport_coach="Basketball", details="I coach a high school team.")
+    chat = Chat.objects.create()
+    chat.participants.add(user)
+    monkeypatch.setattr(ai_logic.response_cache, "get", lambda question, scope: "Cached answer")
+
+    events = ai_logic.stream_response_from_chat(chat, user, "How do I run a zone press?")
+    assert next(events) == {"event": "token", "text": "Cached answer"}
+    events.close()  # the client went away before the done event
+
+    assert list(Message.objects.filter(chat=chat).order_by("id").values_list("content", flat=True)) == [
+        "How do I run a zone press?", "Cached answer",
+    ]
@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+import pytest
+
+import llm_client
+from fake_ollama import FakeOllama
+from llm_client import CANCELLED, DEADLINE, GenerationStream, get_llm
+
+
+@pytest.fixture
+def make_server(monkeypatch):
+    servers = []
+
+    def make(**kwargs):
+        server = FakeOllama(**kwargs).start()
+        servers.append(server)
+        # Fresh pooled clients pointed at this server
+        monkeypatch.setattr(llm_client, "OLLAMA_BASE_URL", server.base_url)
+        monkeypatch.setattr(llm_client, "_client", None)
+        monkeypatch.setattr(llm_client, "_async_client", None)
+        monkeypatch.setattr(llm_client, "_llms", {})
+        return server
+
+    yield make
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def wait_for_cancelled(server, count=1, timeout=5):
+    # The fake notices a closed connection on its next write
+    deadline = time.monotonic() + timeout
+    while server.stats["cancelled"] < count:
+        assert time.monotonic() < deadline, server.stats
+        time.sleep(0.02)
+
+
+def test_full_reply(make_server):
+    server = make_server(tokens_per_second=200, reply_tokens=20)
+    generation = GenerationStream(get_llm("fake"), "hello").run()
+    assert generation.done_reason == "stop"
+    assert not generation.cut_off
+    assert len(generation.chunks) == 20
+    assert server.stats["completed"] == 1
+
+
+def test_num_predict_caps_the_reply(make_server):
+    make_server(tokens_per_second=200, reply_tokens=20)
+    generation = GenerationStream(get_llm("fake", num_predict=5), "hello").run()
+    assert generation.done_reason == "length"
+    assert len(generation.chunks) == 5
+
+
+def test_deadline_cuts_the_stream_and_closes_the_connection(make_server):
+    server = make_server(tokens_per_second=50, reply_tokens=200)
+    generation = GenerationStream(get_llm("fake"), "hello", time.monotonic() + 0.3).run()
+    assert generation.done_reason == DEADLINE
+    assert 0 < len(generation.chunks) < 200
+    assert generation.metadata["eval_count"] == len(generation.chunks)
+    wait_for_cancelled(server)
+    assert server.stats["completed"] == 0
+
+
+def test_deadline_bounds_a_stall_before_the_first_token(make_server):
+    server = make_server(tokens_per_second=50, reply_tokens=20, latency=1.5)
+    started = time.monotonic()
+    generation = GenerationStream(get_llm("fake"), "hello", started + 0.3).run()
+    assert time.monotonic() - started < 1.0
+    assert generation.done_reason == DEADLINE
+    assert generation.chunks == []
+    wait_for_cancelled(server)
+
+
+def test_deadline_bounds_a_stall_between_chunks(make_server):
+    # The stall starts with most of the budget used, so a per-read timeout of the
+    # budget left at the start would run well past the deadline
+    server = make_server(tokens_per_second=50, reply_tokens=200, stall_after=50, stall_seconds=3)
+    started = time.monotonic()
+    generation = GenerationStream(get_llm("fake"), "hello", started + 1.5).run()
+    assert time.monotonic() - started < 1.7
+    assert generation.done_reason == DEADLINE
+    assert len(generation.chunks) == 50
+    wait_for_cancelled(server, timeout=8)
+
+    # The pooled client still works after its connection was cut
+    generation = GenerationStream(get_llm("fake", num_predict=3), "again", time.monotonic() + 10).run()
+    assert generation.done_reason == "length"
+
+
+def test_closing_the_stream_cancels_the_generation(make_server):
+    server = make_server(tokens_per_second=50, reply_tokens=200)
+    generation = GenerationStream(get_llm("fake"), "hello")
+    chunks = generation.stream()
+    for i, _ in enumerate(chunks, 1):
+        if i == 5:
+            chunks.close()
+            break
+    assert generation.done_reason == CANCELLED
+    assert generation.chunks and len(generation.chunks) == 5
+    wait_for_cancelled(server)
+
+
+def test_async_deadline(make_server):
+    server = make_server(tokens_per_second=50, reply_tokens=200, latency=0.2)
+
+    async def main():
+        return await GenerationStream(get_llm("fake"), "hello", time.monotonic() + 0.5).arun()
+
+    generation = asyncio.run(main())
+    assert generation.done_reason == DEADLINE
+    assert 0 < len(generation.chunks) < 200
+    wait_for_cancelled(server)
+
+
+def test_async_cancel(make_server):
+    server = make_server(tokens_per_second=50, reply_tokens=200)
+    generation = GenerationStream(get_llm("fake"), "hello")
+
+    async def main():
+        async def consume():
+            async for _ in generation.astream():
+                pass
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.3)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert generation.done_reason == CANCELLED
+    wait_for_cancelled(server)
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from log_index import connect, fts_query, search, update
+from log_store import LogStore, iter_sessions
+
+JAMES = {"username": "coach_james", "sport": "Basketball", "details": "Warriors fan"}
+MARIA = {"username": "coach_maria", "sport": "Soccer", "details": "Barcelona fan"}
+
+
+@pytest.fixture
+def index(tmp_path):
+    store = LogStore(str(tmp_path / "store"), compress=False)
+    james = store.start_session(JAMES)
+    store.append_turn(james, "user", "Any warriors-update after last night?", timestamp="2025-07-01T10:00:00")
+    store.append_turn(james, "assistant", "Curry sat out the second half.", timestamp="2025-07-03T10:00:00")
+    store.append_turn(james, "user", "Should my team learn C++ for analytics?", timestamp="2025-07-05T10:00:00")
+    maria = store.start_session(MARIA)
+    store.append_turn(maria, "user", "Warriors or Barcelona, who presses better?", timestamp="2025-07-02T10:00:00")
+    store.close()
+
+    legacy = tmp_path / "json"
+    legacy.mkdir()
+    (legacy / "coach_maria_20250601_120000.json").write_text(json.dumps({
+        "username": "coach_maria", "sport": "Soccer", "timestamp": "2025-06-01T12:00:00",
+        "chat_details": [{"role": "user", "content": "Warriors press drills?"}],
+    }))
+
+    conn = connect(str(tmp_path / "index.sqlite3"))
+    update(conn, json_dirs=[str(legacy)], store_dirs=[str(tmp_path / "store")])
+    return conn
+
+
+@pytest.mark.parametrize("query", ["C++", "warriors-update", 'say "hi"', "AND", "curry OR", "(curry"])
+def test_punctuation_is_searched_as_text(index, query):
+    search(index, query)
+
+
+def test_operators_between_words():
+    assert fts_query("curry AND injury") == '"curry" AND "injury"'
+    assert fts_query("AND curry") == '"AND" "curry"'
+    assert fts_query("C++ warriors-update") == '"C++" "warriors-update"'
+
+
+def test_finds_punctuated_terms(index):
+    assert [row[3] for row in search(index, "C++")] == ["Should my team learn [C]++ for analytics?"]
+    assert len(search(index, "warriors-update")) == 1
+
+
+def test_search_is_per_user(index):
+    assert {row[0] for row in search(index, "warriors")} == {"coach_james", "coach_maria"}
+    assert {row[0] for row in search(index, "warriors", username="coach_maria")} == {"coach_maria"}
+    assert search(index, "curry", username="coach_maria") == []
+
+
+def test_since_until_filter_by_turn(index):
+    rows = search(index, "curry OR analytics", since="2025-07-02", until="2025-07-04")
+    assert [(row[1], row[2]) for row in rows] == [("2025-07-03T10:00:00", "assistant")]
+
+
+def test_legacy_turns_use_the_session_time(index):
+    rows = search(index, "drills")
+    assert [row[1] for row in rows] == ["2025-06-01T12:00:00"]
+
+
+def test_backfilled_summary_replaces_the_ended_one(tmp_path):
+    store = LogStore(str(tmp_path / "store"), compress=False)
+    session = store.start_session(JAMES)
+    store.append_turn(session, "user", "Zone defense tips?")
+    store.end_session(session, summary="")
+    store.set_summary(session, "Coach asked about zone defense.")
+    store.close()
+
+    assert [s["summary"] for s in iter_sessions(str(tmp_path / "store"))] == ["Coach asked about zone defense."]
+    conn = connect(str(tmp_path / "index.sqlite3"))
+    update(conn, json_dirs=[], store_dirs=[str(tmp_path / "store")])
+    assert conn.execute("SELECT summary FROM sessions").fetchall() == [("Coach asked about zone defense.",)]
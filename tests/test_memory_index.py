@@ -0,0 +1,126 @@
+import json
+
+import numpy as np
+
+import memory_index
+from memory_index import MemoryIndex
+
+
+class FakeEmbeddings:
+    # One axis per word in VOCAB, so similarity is predictable
+    VOCAB = ["defense", "offense", "rebounds", "injury"]
+
+    def _vector(self, text):
+        return [float(word in text.lower()) for word in self.VOCAB]
+
+    def embed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def search(index, text, **kwargs):
+    return [item["text"] for item in index.search("coach", index.embed_query(text), **kwargs)]
+
+
+def test_newest_row_per_key_wins(tmp_path):
+    index = MemoryIndex(str(tmp_path), FakeEmbeddings(), min_score=0.5)
+    index.add("coach", [{"text": "defense drills", "key": "summary"}, {"text": "offense sets", "key": "a"}])
+    assert search(index, "defense") == ["defense drills"]
+    index.add("coach", [{"text": "defense and rebounds", "key": "summary"}])
+    assert search(index, "defense") == ["defense and rebounds"]
+    assert search(index, "offense") == ["offense sets"]
+
+
+def test_refresh_parses_only_appended_lines(tmp_path, monkeypatch):
+    index = MemoryIndex(str(tmp_path), FakeEmbeddings(), min_score=0.5)
+    index.add("coach", [{"text": f"defense note {i}", "key": i} for i in range(50)])
+    search(index, "defense")
+
+    parsed = []
+    real_loads = json.loads
+    monkeypatch.setattr(memory_index.json, "loads", lambda line: parsed.append(line) or real_loads(line))
+    index.add("coach", [{"text": "injury report", "key": "new"}])
+    assert search(index, "injury") == ["injury report"]
+    assert len(parsed) == 1
+
+
+def test_partial_line_waits_for_its_newline(tmp_path):
+    index = MemoryIndex(str(tmp_path), FakeEmbeddings(), min_score=0.5)
+    index.add("coach", [{"text": "defense drills", "key": "a"}])
+    store = index._store("coach")
+    # Another process is halfway through appending a row
+    with open(store.vec_path, "ab") as f:
+        f.write(np.asarray([[0, 0, 0, 1]], dtype=np.float32).tobytes())
+    with open(store.meta_path, "a", encoding="utf-8") as f:
+        f.write('{"text": "injury rep')
+    assert search(index, "injury") == []
+    with open(store.meta_path, "a", encoding="utf-8") as f:
+        f.write('ort", "key": "b"}\n')
+    assert search(index, "injury") == ["injury report"]
+
+
+def test_replaced_files_are_reread(tmp_path):
+    index = MemoryIndex(str(tmp_path), FakeEmbeddings(), min_score=0.5)
+    index.add("coach", [{"text": "defense drills", "key": "a"}, {"text": "offense sets", "key": "b"}])
+    assert search(index, "offense") == ["offense sets"]
+    other = MemoryIndex(str(tmp_path / "other"), FakeEmbeddings())
+    other.add("coach", [{"text": "injury report", "key": "c"}])
+    store, new = index._store("coach"), other._store("coach")
+    for path, source in ((store.vec_path, new.vec_path), (store.meta_path, new.meta_path)):
+        with open(source, "rb") as src, open(path, "wb") as dst:
+            dst.write(src.read())
+    assert search(index, "offense") == []
+    assert search(index, "injury") == ["injury report"]
+
+
+def test_orphan_vector_row_is_cut_before_the_next_append(tmp_path):
+    index = MemoryIndex(str(tmp_path), FakeEmbeddings(), min_score=0.5)
+    index.add("coach", [{"text": "defense drills", "key": "a"}])
+    store = index._store("coach")
+    # A writer crashed after its vector and before its metadata line
+    with open(store.vec_path, "ab") as f:
+        f.write(np.asarray([[0, 0, 0, 1]], dtype=np.float32).tobytes())
+    index.add("coach", [{"text": "offense sets", "key": "b"}, {"text": "injury report", "key": "c"}])
+    assert search(index, "offense") == ["offense sets"]
+    assert search(index, "injury") == ["injury report"]
+    fresh = MemoryIndex(str(tmp_path), FakeEmbeddings(), min_score=0.5)
+    assert [item["score"] for item in fresh.search("coach", fresh.embed_query("offense"))] == [1.0]
+
+
+def test_rewritten_keys_are_compacted(tmp_path, monkeypatch):
+    monkeypatch.setattr(memory_index, "COMPACT_MIN_DEAD_ROWS", 4)
+    index = MemoryIndex(str(tmp_path), FakeEmbeddings(), min_score=0.5)
+    index.add("coach", [{"text": "offense sets", "key": "notes"}])
+    for i in range(10):
+        index.add("coach", [{"text": f"defense summary {i}", "key": "summary"}])
+    store = index._store("coach")
+    with open(store.meta_path, encoding="utf-8") as f:
+        rows = [json.loads(line)["row"] for line in f]
+    assert len(rows) < 6 and rows == list(range(len(rows)))
+    assert search(index, "defense") == ["defense summary 9"]
+    assert search(index, "offense") == ["offense sets"]
+
+
+def _append_from_process(directory, worker):
+    index = MemoryIndex(directory, FakeEmbeddings())
+    for i in range(20):
+        word = FakeEmbeddings.VOCAB[(worker + i) % len(FakeEmbeddings.VOCAB)]
+        index.add("coach", [{"text": f"{word} {worker}-{i}", "key": f"{worker}-{i}"}])
+
+
+def test_concurrent_appends_from_processes_stay_aligned(tmp_path):
+    import multiprocessing
+
+    processes = [multiprocessing.Process(target=_append_from_process, args=(str(tmp_path), w)) for w in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+        assert process.exitcode == 0
+    index = MemoryIndex(str(tmp_path), FakeEmbeddings(), min_score=0.5)
+    for word in FakeEmbeddings.VOCAB:
+        results = index.search("coach", index.embed_query(word), k=100)
+        assert len(results) == 20
+        assert all(item["text"].startswith(word) and item["score"] == 1.0 for item in results)
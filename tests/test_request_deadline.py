@@ -0,0 +1,29 @@
+import time
+
+import pytest
+
+pytest.importorskip("pytest_django")
+
+from django.test import RequestFactory  # noqa: E402
+
+from chat.ai_logic import REPLY_DEADLINE_SECONDS  # noqa: E402
+from chat.backend_integrate import request_deadline  # noqa: E402
+
+
+def seconds_granted(header=None):
+    headers = {} if header is None else {"HTTP_X_REQUEST_TIMEOUT": header}
+    request = RequestFactory().post("/", **headers)
+    return request_deadline(request) - time.monotonic()
+
+
+def test_header_shortens_the_deadline():
+    assert seconds_granted("5") == pytest.approx(min(5, REPLY_DEADLINE_SECONDS), abs=0.5)
+
+
+@pytest.mark.parametrize("header", [None, "nan", "NaN", "inf", "-inf", "-5", "0", "soon", ""])
+def test_unusable_header_keeps_the_server_cap(header):
+    assert seconds_granted(header) == pytest.approx(REPLY_DEADLINE_SECONDS, abs=0.5)
+
+
+def test_header_cannot_extend_the_cap():
+    assert seconds_granted(str(REPLY_DEADLINE_SECONDS * 10)) == pytest.approx(REPLY_DEADLINE_SECONDS, abs=0.5)
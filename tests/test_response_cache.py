@@ -0,0 +1,45 @@
+from response_cache import ResponseCache
+
+
+class FakeEmbeddings:
+    # One axis per word in VOCAB, so similarity is predictable
+    VOCAB = ["team", "player", "defense"]
+
+    def embed_query(self, text):
+        return [float(word in text.lower()) for word in self.VOCAB]
+
+
+def test_exact_and_semantic_hits_and_misses_are_counted():
+    cache = ResponseCache(embeddings=FakeEmbeddings())
+    cache.put("How is my team doing?", "coach_a", "Won three straight.")
+
+    assert cache.get("how is my TEAM doing", "coach_a") == "Won three straight."
+    assert cache.get("Update me about my team", "coach_a") == "Won three straight."
+    assert cache.get("Who is my best player?", "coach_a") is None
+
+    assert cache.metrics == {"exact_hits": 1, "semantic_hits": 1, "misses": 1, "evictions": 0}
+
+
+def test_semantic_scopes_are_capped_least_recently_used_first():
+    cache = ResponseCache(embeddings=FakeEmbeddings(), max_scopes=2)
+    cache.put("How is my team doing?", "coach_a", "A")
+    cache.put("How is my team doing?", "coach_b", "B")
+    assert cache.get("Update me about my team", "coach_a") == "A"  # coach_b is now the oldest
+    cache.put("How is my team doing?", "coach_c", "C")
+
+    assert list(cache._semantic) == ["coach_a", "coach_c"]
+    assert cache.get("Update me about my team", "coach_b") is None
+    assert cache.metrics["evictions"] == 1
+
+
+def test_render_prometheus_exports_the_counters():
+    cache = ResponseCache(max_entries=1)
+    cache.put("first question", "coach_a", "one")
+    cache.put("second question", "coach_a", "two")
+    cache.get("second question", "coach_a")
+    cache.get("first question", "coach_a")
+
+    text = cache.render_prometheus()
+    assert 'chat_response_cache_lookups_total{result="exact_hit"} 1' in text
+    assert 'chat_response_cache_lookups_total{result="miss"} 1' in text
+    assert "chat_response_cache_evictions_total 1" in text
@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+
+from scheduler import BATCH, INTERACTIVE, SUMMARY, ModelScheduler, Overloaded
+
+
+def test_shed_request_keeps_user_tokens():
+    scheduler = ModelScheduler(max_concurrency=1, max_queue=0, user_rate=0.001, user_burst=1)
+    with scheduler.slot(user_id="busy"):
+        for _ in range(3):
+            with pytest.raises(Overloaded) as shed:
+                with scheduler.slot(user_id="alice"):
+                    pass
+            assert str(shed.value) == "LLM server is busy"
+    # alice's one token was never spent
+    with scheduler.slot(user_id="alice"):
+        pass
+    with pytest.raises(Overloaded, match="for this user"):
+        with scheduler.slot(user_id="alice"):
+            pass
+
+
+def test_full_buckets_are_evicted():
+    scheduler = ModelScheduler(max_concurrency=1, max_queue=0, user_rate=1e9, user_burst=1, max_buckets=10)
+    for user_id in range(100):
+        with scheduler.slot(user_id=user_id):
+            pass
+    assert len(scheduler._buckets) <= 10
+
+
+def test_limited_buckets_are_kept():
+    scheduler = ModelScheduler(max_concurrency=1, max_queue=0, user_rate=0.001, user_burst=1, max_buckets=10)
+    for user_id in range(20):
+        with scheduler.slot(user_id=user_id):
+            pass
+    # Every user is still rate limited, so none of their buckets may be forgotten
+    assert len(scheduler._buckets) == 20
+    with pytest.raises(Overloaded, match="for this user"):
+        with scheduler.slot(user_id=0):
+            pass
+
+
+def fake_llm_call(scheduler, priority, log, running, seconds=0.05, timeout=None):
+    # Holds a slot like a model call that takes `seconds`
+    with scheduler.slot(priority, timeout=timeout):
+        with running["lock"]:
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+        log.append(priority)
+        time.sleep(seconds)
+        with running["lock"]:
+            running["now"] -= 1
+
+
+def new_running():
+    return {"lock": threading.Lock(), "now": 0, "peak": 0}
+
+
+def start(target, *args, **kwargs):
+    thread = threading.Thread(target=target, args=args, kwargs=kwargs)
+    thread.start()
+    return thread
+
+
+def wait_for_queue(scheduler, depth):
+    deadline = time.monotonic() + 5
+    while scheduler.queue_depth() < depth:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_no_more_than_max_concurrency_calls_run_at_once():
+    scheduler = ModelScheduler(max_concurrency=3, max_queue=100)
+    running = new_running()
+    log = []
+    threads = [start(fake_llm_call, scheduler, INTERACTIVE, log, running) for _ in range(20)]
+    for thread in threads:
+        thread.join()
+    assert len(log) == 20
+    assert running["peak"] == 3
+
+
+def test_queued_work_runs_by_priority():
+    scheduler = ModelScheduler(max_concurrency=1, max_queue=100)
+    running = new_running()
+    log = []
+    # Occupy the only slot, then queue BATCH first and INTERACTIVE last
+    holder = start(fake_llm_call, scheduler, INTERACTIVE, [], running, seconds=0.3)
+    time.sleep(0.05)
+    threads = []
+    for priority in (BATCH, SUMMARY, INTERACTIVE, BATCH, SUMMARY, INTERACTIVE):
+        threads.append(start(fake_llm_call, scheduler, priority, log, running, seconds=0.01))
+        wait_for_queue(scheduler, len(threads))
+    for thread in [holder] + threads:
+        thread.join()
+    assert log == [INTERACTIVE, INTERACTIVE, SUMMARY, SUMMARY, BATCH, BATCH]
+
+
+def test_timeout_while_queued_raises_overloaded():
+    scheduler = ModelScheduler(max_concurrency=1, max_queue=100)
+    holder = start(fake_llm_call, scheduler, INTERACTIVE, [], new_running(), seconds=0.5)
+    time.sleep(0.05)
+    started = time.monotonic()
+    with pytest.raises(Overloaded):
+        with scheduler.slot(INTERACTIVE, timeout=0.1):
+            pass
+    assert time.monotonic() - started < 0.4
+    assert scheduler.queue_depth() == 0  # the expired waiter left the queue
+    holder.join()
+    with scheduler.slot(INTERACTIVE, timeout=0.1):
+        pass
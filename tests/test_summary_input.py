@@ -0,0 +1,35 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pytest_django")
+
+from chat.ai_logic import SUMMARY_BATCH_MESSAGES, build_summary_input  # noqa: E402
+from chat.context_builder import CONTEXT_WINDOW, REPLY_RESERVE_TOKENS, count_tokens  # noqa: E402
+
+USER = SimpleNamespace(id=1)
+CONTENT = "What should we change in our defense rotation before the next game? " * 4
+# A long one-paragraph summary, as the model writes them after many turns
+SUMMARY = "The coach asked about defense rotations, drills and the next opponent. " * 12
+
+
+def worst_summary_input(message_count):
+    # Largest rendered summarizer input while folding message_count messages in, batch
+    # by batch, the way update_topic_summary does
+    messages = [SimpleNamespace(sender_id=1 + i % 2, content=CONTENT) for i in range(message_count)]
+    summary = ""
+    worst = 0
+    for start in range(0, message_count, SUMMARY_BATCH_MESSAGES):
+        prompt, inputs = build_summary_input(summary, messages[start:start + SUMMARY_BATCH_MESSAGES], USER)
+        worst = max(worst, count_tokens(prompt.format(**inputs)))
+        summary = SUMMARY
+    return worst
+
+
+@pytest.mark.parametrize("message_count", [10, 100, 1000])
+def test_summary_input_fits_the_context_window(message_count):
+    assert worst_summary_input(message_count) <= CONTEXT_WINDOW - REPLY_RESERVE_TOKENS
+
+
+def test_summary_input_does_not_grow_with_history():
+    assert worst_summary_input(1000) == worst_summary_input(2 * SUMMARY_BATCH_MESSAGES)